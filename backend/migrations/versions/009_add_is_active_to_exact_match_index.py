@@ -0,0 +1,36 @@
+"""Extend the tariff exact-match index with is_active
+
+Revision ID: 009_add_is_active_to_exact_match_index
+Revises: 008_add_category_rates_field
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009_add_is_active_to_exact_match_index'
+down_revision = '008_add_category_rates_field'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Replace idx_exact_match with an index that also covers is_active"""
+    op.drop_index('idx_exact_match', table_name='tariff_rates')
+    op.create_index(
+        'idx_exact_match_active', 'tariff_rates',
+        ['origin_country', 'destination_country', 'goods_category', 'postal_service',
+         'start_date', 'end_date', 'min_weight', 'max_weight', 'is_active']
+    )
+
+
+def downgrade():
+    """Restore the original exact-match index"""
+    op.drop_index('idx_exact_match_active', table_name='tariff_rates')
+    op.create_index(
+        'idx_exact_match', 'tariff_rates',
+        ['origin_country', 'destination_country', 'goods_category', 'postal_service',
+         'start_date', 'end_date', 'min_weight', 'max_weight']
+    )
@@ -0,0 +1,38 @@
+"""Add parsed arrival date column to processed_shipments
+
+Revision ID: 010_add_arrival_date_parsed_to_shipments
+Revises: 009_add_is_active_to_exact_match_index
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010_add_arrival_date_parsed_to_shipments'
+down_revision = '009_add_is_active_to_exact_match_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add arrival_date_parsed, backfill it from the arrival_date string and index it"""
+    op.add_column('processed_shipments', sa.Column('arrival_date_parsed', sa.Date(), nullable=True))
+    
+    # Same conversion the date filter used to apply per row at query time
+    op.execute(
+        "UPDATE processed_shipments SET arrival_date_parsed = date(substr(arrival_date, 1, 10)) "
+        "WHERE arrival_date IS NOT NULL AND arrival_date != ''"
+    )
+    
+    op.create_index(
+        'idx_shipment_arrival_destination', 'processed_shipments',
+        ['arrival_date_parsed', 'host_destination_station']
+    )
+
+
+def downgrade():
+    """Remove the parsed arrival date column and its index"""
+    op.drop_index('idx_shipment_arrival_destination', table_name='processed_shipments')
+    op.drop_column('processed_shipments', 'arrival_date_parsed')
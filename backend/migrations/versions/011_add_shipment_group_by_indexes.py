@@ -0,0 +1,30 @@
+"""Add route, destination and carrier indexes to processed_shipments
+
+Revision ID: 011_add_shipment_group_by_indexes
+Revises: 010_add_arrival_date_parsed_to_shipments
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011_add_shipment_group_by_indexes'
+down_revision = '010_add_arrival_date_parsed_to_shipments'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Index the columns shipments are grouped by; the duplicate check already uses uix_shipment_unique"""
+    op.create_index('idx_shipment_route', 'processed_shipments', ['host_origin_station', 'host_destination_station'])
+    op.create_index('idx_shipment_destination', 'processed_shipments', ['host_destination_station'])
+    op.create_index('idx_shipment_carrier', 'processed_shipments', ['flight_carrier_1'])
+
+
+def downgrade():
+    """Remove the group-by indexes"""
+    op.drop_index('idx_shipment_carrier', table_name='processed_shipments')
+    op.drop_index('idx_shipment_destination', table_name='processed_shipments')
+    op.drop_index('idx_shipment_route', table_name='processed_shipments')
@@ -6,16 +6,61 @@ import shutil
 # Add the src directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, make_response, stream_with_context
 from flask_cors import CORS
 from flask_migrate import Migrate
 import pandas as pd
 import io
+import json
+import time
 from datetime import datetime, date
-from models.database import db, ProcessedShipment, TariffRate, SystemConfig, FileUploadHistory
+from functools import lru_cache, wraps
+from itertools import chain
+from models.database import db, ProcessedShipment, TariffRate, SystemConfig, FileUploadHistory, NULL_VALUE_TOKENS, invalidate_route_rate_cache, set_sqlite_pragmas, upgrade_legacy_schema
 from config.settings import Config
-from sqlalchemy import func, and_, or_
-from services.data_processor import DataProcessor
+from sqlalchemy import event, func, and_, or_, false, case, distinct, update, select, union, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from services.data_processor import DataProcessor, EXCEL_READ_ENGINE, EXCEL_WRITE_ENGINE
+from utils.data_converter import safe_float_series
+from utils.json_provider import OrjsonProvider
+
+# Currency tokens treated as missing by the analytics currency breakdown
+_BAD_CURRENCY = NULL_VALUE_TOKENS | {''}
+
+# CBD export columns copied onto each saved shipment, keyed by their ProcessedShipment field
+_CBD_EXPORT_FIELDS = {
+    'Carrier Code': 'carrier_code',
+    'Flight/Trip Number': 'flight_trip_number',
+    'Arrival Port Code': 'arrival_port_code',
+    'Arrival Date': 'arrival_date_formatted',
+    'Declared Value (USD)': 'declared_value_usd'
+}
+
+# Rows per INSERT statement when saving processed shipments
+SHIPMENT_INSERT_BATCH_SIZE = 10000
+
+# Shipment INSERT that skips rows already stored under uix_shipment_unique; built once at import so every
+# upload reuses the same statement (and its cached compiled form)
+_INSERT_NEW_SHIPMENTS = sqlite_insert(ProcessedShipment.__table__).on_conflict_do_nothing(
+    index_elements=['tracking_number', 'receptacle_id', 'pawb']
+)
+
+# Ids per DELETE ... WHERE id IN (...) statement when deleting selected shipments
+SHIPMENT_DELETE_CHUNK_SIZE = 1000
+
+# Shipments per executemany UPDATE statement when recalculating tariffs (all committed together)
+SHIPMENT_UPDATE_BATCH_SIZE = 1000
+
+# Shipments fetched per round trip while streaming Excel exports
+EXPORT_YIELD_PER = 5000
+
+# Records fetched and encoded per chunk when streaming shipment listings as JSON
+JSON_STREAM_BATCH_SIZE = 1000
+
+# Dashboard analytics payloads and export workbooks are memoized per filter set; entries expire after the TTL
+# or when any process commits a shipment write (which bumps this persisted SystemConfig counter)
+SHIPMENT_CACHE_TTL_SECONDS = 300
+SHIPMENT_DATA_VERSION_KEY = 'shipment_data_version'
 
 def _safe_float(value):
     """Safely convert value to float, return None if invalid"""
@@ -27,7 +72,17 @@ def _safe_int(value):
     from utils.data_converter import safe_int_conversion
     return safe_int_conversion(value)
 
+def _parse_iso_date(value, default=None):
+    """Parse a YYYY-MM-DD value with date.fromisoformat, return default if missing or invalid"""
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except (ValueError, TypeError):
+        return default
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config.from_object(Config)
 
 # Initialize the database
@@ -37,7 +92,11 @@ CORS(app)
 
 # Create database tables
 with app.app_context():
+    # SQLite connection tuning for this app's engine only (scripts and other engines keep SQLite's defaults)
+    event.listen(db.engine, 'connect', set_sqlite_pragmas)
     db.create_all()
+    # Existing tables don't get new columns/indexes from create_all(); add them before any shipment query runs
+    upgrade_legacy_schema()
 
 # IODA data file path (the preprocessed master data)
 import os
@@ -47,96 +106,99 @@ IODA_DATA_FILE = os.path.join(PROJECT_ROOT, "sample-data", "ioda", "master_cardi
 def save_chinapost_data_to_database(chinapost_df: pd.DataFrame, cbd_df: pd.DataFrame, upload_id=None) -> tuple:
     """Save CHINAPOST export data to database with CBD export fields"""
     new_entries = 0
-    skipped_entries = 0
     
-    # Create a mapping of CBD data for easy lookup
+    # Create a mapping of CBD data for easy lookup (built column-wise; the last row wins for repeated tracking numbers)
     cbd_dict = {}
     if not cbd_df.empty:
-        for _, cbd_row in cbd_df.iterrows():
-            tracking_num = cbd_row.get('Tracking Number', '')
-            cbd_dict[tracking_num] = {
-                'carrier_code': cbd_row.get('Carrier Code', ''),
-                'flight_trip_number': cbd_row.get('Flight/Trip Number', ''),
-                'arrival_port_code': cbd_row.get('Arrival Port Code', ''),
-                'arrival_date_formatted': cbd_row.get('Arrival Date', ''),
-                'declared_value_usd': cbd_row.get('Declared Value (USD)', '')
-            }
+        cbd_dict = cbd_df.reindex(
+            columns=['Tracking Number', *_CBD_EXPORT_FIELDS], fill_value=''
+        ).rename(columns=_CBD_EXPORT_FIELDS).drop_duplicates(
+            'Tracking Number', keep='last'
+        ).set_index('Tracking Number').to_dict('index')
     
-    for _, row in chinapost_df.iterrows():
-        # Check if entry already exists
-        tracking_number = str(row.get('Tracking Number', ''))
-        receptacle_id = str(row.get('Receptacle', ''))
-        pawb = str(row.get('PAWB', ''))
-        
-        existing_entry = ProcessedShipment.query.filter_by(
-            tracking_number=tracking_number,
-            receptacle_id=receptacle_id,
-            pawb=pawb
-        ).first()
-        
-        if existing_entry:
-            skipped_entries += 1
-            continue  # Skip duplicate entry
+    # Plain dict records (built via itertuples) avoid constructing a Series per row
+    records = chinapost_df.to_dict('records')
+    record_keys = [
+        (str(row.get('Tracking Number', '')), str(row.get('Receptacle', '')), str(row.get('PAWB', '')))
+        for row in records
+    ]
+    
+    # Numeric columns converted column-wise rather than per row
+    float_columns = {
+        field: (safe_float_series(chinapost_df[column]).tolist() if column in chinapost_df.columns
+                else [None] * len(records))
+        for field, column in (('bag_weight', 'Bag weight'), ('declared_value', 'Declared Value'),
+                              ('tariff_amount', 'Tariff amount'))
+    }
+    
+    rows = []
+    
+    for index, (row, key) in enumerate(zip(records, record_keys)):
+        tracking_number, receptacle_id, pawb = key
         
         # Get CBD data for this tracking number
         cbd_data = cbd_dict.get(tracking_number, {})
         
-        # Create new processed shipment entry
-        entry = ProcessedShipment()
-        
-        # Associate with upload record
-        entry.file_upload_id = upload_id
-        
-        # Core identification
-        entry.sequence_number = str(row.get('', ''))
-        entry.pawb = pawb
-        entry.cardit = str(row.get('CARDIT', ''))
-        entry.tracking_number = tracking_number
-        entry.receptacle_id = receptacle_id
-        
-        # Flight and routing information
-        entry.host_origin_station = str(row.get('Host Origin Station', ''))
-        entry.host_destination_station = str(row.get('Host Destination Station', ''))
-        entry.flight_carrier_1 = str(row.get('Flight Carrier 1', ''))
-        entry.flight_number_1 = str(row.get('Flight Number 1', ''))
-        entry.flight_date_1 = str(row.get('Flight Date 1', ''))
-        entry.flight_carrier_2 = str(row.get('Flight Carrier 2', ''))
-        entry.flight_number_2 = str(row.get('Flight Number 2', ''))
-        entry.flight_date_2 = str(row.get('Flight Date 2', ''))
-        entry.flight_carrier_3 = str(row.get('Flight Carrier 3', ''))
-        entry.flight_number_3 = str(row.get('Flight Number 3', ''))
-        entry.flight_date_3 = str(row.get('Flight Date 3', ''))
-        
-        # Arrival and ULD information
-        entry.arrival_date = str(row.get('Arrival Date', ''))
-        entry.arrival_uld_number = str(row.get('Arrival ULD number', ''))
-        
-        # Package and content details
-        entry.bag_weight = _safe_float(row.get('Bag weight'))
-        entry.bag_number = str(row.get('Bag Number', ''))
-        entry.declared_content = str(row.get('Declared content', ''))
-        entry.hs_code = str(row.get('HS Code', ''))
-        entry.declared_value = _safe_float(row.get('Declared Value'))
-        entry.currency = str(row.get('Currency', ''))
-        entry.number_of_packets = _safe_int(row.get('Number of Packet under same receptacle'))
-        entry.tariff_amount = _safe_float(row.get('Tariff amount'))
-        
-        # Enhanced tariff fields
-        entry.goods_category = str(row.get('Declared content category', ''))
-        entry.postal_service = str(row.get('Postal service type', ''))
-        entry.tariff_rate_used = row.get('Tariff rate used') if pd.notnull(row.get('Tariff rate used')) else None
-        entry.tariff_calculation_method = str(row.get('Tariff calculation method', ''))
-        entry.shipment_date = row.get('Shipment date') if pd.notnull(row.get('Shipment date')) else None
-        
-        # CBD export derived fields
-        entry.carrier_code = cbd_data.get('carrier_code', '')
-        entry.flight_trip_number = cbd_data.get('flight_trip_number', '')
-        entry.arrival_port_code = cbd_data.get('arrival_port_code', '')
-        entry.arrival_date_formatted = cbd_data.get('arrival_date_formatted', '')
-        entry.declared_value_usd = cbd_data.get('declared_value_usd', '')
-        
-        db.session.add(entry)
-        new_entries += 1
+        # Plain column mapping for the bulk INSERT (no per-row ORM instance)
+        rows.append({
+            # Associate with upload record
+            'file_upload_id': upload_id,
+            
+            # Core identification
+            'sequence_number': str(row.get('', '')),
+            'pawb': pawb,
+            'cardit': str(row.get('CARDIT', '')),
+            'tracking_number': tracking_number,
+            'receptacle_id': receptacle_id,
+            
+            # Flight and routing information
+            'host_origin_station': str(row.get('Host Origin Station', '')),
+            'host_destination_station': str(row.get('Host Destination Station', '')),
+            'flight_carrier_1': str(row.get('Flight Carrier 1', '')),
+            'flight_number_1': str(row.get('Flight Number 1', '')),
+            'flight_date_1': str(row.get('Flight Date 1', '')),
+            'flight_carrier_2': str(row.get('Flight Carrier 2', '')),
+            'flight_number_2': str(row.get('Flight Number 2', '')),
+            'flight_date_2': str(row.get('Flight Date 2', '')),
+            'flight_carrier_3': str(row.get('Flight Carrier 3', '')),
+            'flight_number_3': str(row.get('Flight Number 3', '')),
+            'flight_date_3': str(row.get('Flight Date 3', '')),
+            
+            # Arrival and ULD information
+            'arrival_date': str(row.get('Arrival Date', '')),
+            'arrival_date_parsed': _parse_iso_date(str(row.get('Arrival Date', ''))[:10]),
+            'arrival_uld_number': str(row.get('Arrival ULD number', '')),
+            
+            # Package and content details
+            'bag_weight': float_columns['bag_weight'][index],
+            'bag_number': str(row.get('Bag Number', '')),
+            'declared_content': str(row.get('Declared content', '')),
+            'hs_code': str(row.get('HS Code', '')),
+            'declared_value': float_columns['declared_value'][index],
+            'currency': str(row.get('Currency', '')),
+            'number_of_packets': _safe_int(row.get('Number of Packet under same receptacle')),
+            'tariff_amount': float_columns['tariff_amount'][index],
+            
+            # Enhanced tariff fields
+            'goods_category': str(row.get('Declared content category', '')),
+            'postal_service': str(row.get('Postal service type', '')),
+            'tariff_rate_used': row.get('Tariff rate used') if pd.notnull(row.get('Tariff rate used')) else None,
+            'tariff_calculation_method': str(row.get('Tariff calculation method', '')),
+            'shipment_date': row.get('Shipment date') if pd.notnull(row.get('Shipment date')) else None,
+            
+            # CBD export derived fields
+            'carrier_code': cbd_data.get('carrier_code', ''),
+            'flight_trip_number': cbd_data.get('flight_trip_number', ''),
+            'arrival_port_code': cbd_data.get('arrival_port_code', ''),
+            'arrival_date_formatted': cbd_data.get('arrival_date_formatted', ''),
+            'declared_value_usd': cbd_data.get('declared_value_usd', '')
+        })
+    
+    # Batched INSERTs that let the uix_shipment_unique index skip duplicates (already stored or repeated in
+    # this upload) instead of checking keys beforehand; ignored rows are not counted in rowcount
+    for offset in range(0, len(rows), SHIPMENT_INSERT_BATCH_SIZE):
+        new_entries += db.session.execute(_INSERT_NEW_SHIPMENTS, rows[offset:offset + SHIPMENT_INSERT_BATCH_SIZE]).rowcount
+    skipped_entries = len(rows) - new_entries
     
     return new_entries, skipped_entries
 
@@ -153,7 +215,6 @@ def health_check():
 @app.route('/upload-cnp-file', methods=['POST'])
 def upload_cnp_file():
     """Upload and process raw CNP Excel file with file history tracking"""
-    temp_path = None
     upload_record = None
     
     try:
@@ -202,14 +263,9 @@ def upload_cnp_file():
         upload_record.mark_processing_started()
         
         try:
-            # Save uploaded file temporarily for processing
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            temp_path = f"temp_{timestamp}_{file.filename}"
-            with open(temp_path, 'wb') as f:
-                f.write(file_content)
-            
-            # Read the raw CNP data from the first sheet (header=None for custom parsing)
-            cnp_df = pd.read_excel(temp_path, sheet_name='Raw data provided by CNP', header=None)
+            # Read the raw CNP data from the first sheet (header=None for custom parsing),
+            # parsing the bytes already in memory instead of writing them to a temp file
+            cnp_df = pd.read_excel(io.BytesIO(file_content), sheet_name='Raw data provided by CNP', header=None, engine=EXCEL_READ_ENGINE)
             
             # Check if IODA file exists before processing
             if not os.path.exists(IODA_DATA_FILE):
@@ -233,12 +289,12 @@ def upload_cnp_file():
                 cbd_buffer = io.BytesIO()
                 
                 # Save CHINAPOST export to buffer
-                with pd.ExcelWriter(chinapost_buffer, engine='openpyxl') as writer:
+                with pd.ExcelWriter(chinapost_buffer, engine=EXCEL_WRITE_ENGINE) as writer:
                     chinapost_df.to_excel(writer, sheet_name='CHINAPOST Export', index=False)
                 chinapost_buffer.seek(0)
                 
                 # Save CBD export to buffer
-                with pd.ExcelWriter(cbd_buffer, engine='openpyxl') as writer:
+                with pd.ExcelWriter(cbd_buffer, engine=EXCEL_WRITE_ENGINE) as writer:
                     cbd_df.to_excel(writer, sheet_name='CBD Export', index=False)
                 cbd_buffer.seek(0)
                 
@@ -304,23 +360,41 @@ def upload_cnp_file():
             if upload_record:
                 upload_record.mark_processing_failed(str(processing_error))
             raise processing_error
-            
-        finally:
-            # Clean up temporary file
-            if temp_path and os.path.exists(temp_path):
-                os.remove(temp_path)
                 
     except Exception as e:
-        # Clean up temporary file in case of error
-        if temp_path and os.path.exists(temp_path):
-            os.remove(temp_path)
-        
         # Mark processing as failed if we have an upload record
         if upload_record:
             upload_record.mark_processing_failed(str(e))
             
         return jsonify({"error": str(e)}), 500
 
+def _execute_shipment_rows(query):
+    """Run a shipment query as plain column rows (no ORM objects), fetched JSON_STREAM_BATCH_SIZE at a time"""
+    return db.session.execute(
+        query.with_entities(*ProcessedShipment.__table__.columns).statement.execution_options(
+            yield_per=JSON_STREAM_BATCH_SIZE
+        )
+    )
+
+def _stream_records_json(result, build_fields):
+    """
+    Stream {"data": [shipment rows], **build_fields(record_count)} as JSON from a yield_per result, fetching,
+    converting and encoding one batch of rows at a time; the trailing fields are built once the count is known
+    """
+    def generate():
+        record_count = 0
+        yield '{"data":['
+        for rows in result.partitions():
+            if record_count:
+                yield ','
+            # Cleaned database data (row_to_dict blanks NaN/null placeholders)
+            yield app.json.dumps([ProcessedShipment.row_to_dict(row) for row in rows])[1:-1]
+            record_count += len(rows)
+        yield '],' + app.json.dumps(build_fields(record_count))[1:]
+    
+    # The session (and its open cursor) must outlive the view while the body is generated
+    return Response(stream_with_context(generate()), mimetype=app.json.mimetype)
+
 @app.route('/get-recent-upload-data', methods=['GET'])
 def get_recent_upload_data():
     """Get data from the most recent file upload only"""
@@ -335,28 +409,13 @@ def get_recent_upload_data():
                 'message': 'No processed files found'
             })
         
-        # Get all records from the most recent upload
-        entries = ProcessedShipment.query.filter(
+        # Records from the most recent upload, streamed as they are fetched
+        result = _execute_shipment_rows(ProcessedShipment.query.filter(
             ProcessedShipment.file_upload_id == most_recent_upload_id
-        ).all()
-        
-        # Return cleaned database data
-        results = []
-        for entry in entries:
-            record_dict = entry.to_dict()
-            
-            # Clean up common fields that may contain invalid values
-            for field in ['declared_value', 'tariff_amount', 'bag_weight', 'currency']:
-                if field in record_dict and record_dict[field]:
-                    val_str = str(record_dict[field]).lower().strip()
-                    if val_str in ['nan', 'null', 'none', 'n/a', 'na']:
-                        record_dict[field] = ''
-            
-            results.append(record_dict)
+        ))
 
-        return jsonify({
-            'data': results,
-            'total_records': len(results),
+        return _stream_records_json(result, lambda record_count: {
+            'total_records': record_count,
             'upload_id': most_recent_upload_id,
             'message': f'Data from most recent upload (ID: {most_recent_upload_id})'
         })
@@ -373,35 +432,19 @@ def get_historical_data():
         # Use the filtering function for historical data (queries entire database)
         query = build_filtered_shipment_query(data, use_all_data=True)
         
-        # Execute query and return RAW database records
-        entries = query.all()
-        
-        # Return cleaned database data with NaN/null filtering
-        results = []
-        for entry in entries:
-            # Get base dictionary and clean up NaN/null values
-            record_dict = entry.to_dict()
-            
-            # Clean up common fields that may contain invalid values
-            for field in ['declared_value', 'tariff_amount', 'bag_weight', 'currency']:
-                if field in record_dict and record_dict[field]:
-                    val_str = str(record_dict[field]).lower().strip()
-                    if val_str in ['nan', 'null', 'none', 'n/a', 'na']:
-                        record_dict[field] = ''
-            
-            results.append(record_dict)
+        # Execute query and stream RAW database records (insertion order; the date index would otherwise drive it)
+        result = _execute_shipment_rows(query.order_by(ProcessedShipment.id))
 
-        return jsonify({
-            'data': results,
-            'total_records': len(results),
+        return _stream_records_json(result, lambda record_count: {
+            'total_records': record_count,
             'results': {
                 'chinapost_export': {
                     'available': True,
-                    'records_processed': len(results)
+                    'records_processed': record_count
                 },
                 'cbd_export': {
                     'available': True,
-                    'records_processed': len(results)
+                    'records_processed': record_count
                 }
             }
         })
@@ -409,6 +452,14 @@ def get_historical_data():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _arrival_date_filter(start_date, end_date):
+    """Range filter on the arrival date parsed at ingest (index range scan); unparseable bounds match nothing"""
+    start = _parse_iso_date(start_date)
+    end = _parse_iso_date(end_date)
+    if not (start and end):
+        return false()
+    return ProcessedShipment.arrival_date_parsed.between(start, end)
+
 def build_filtered_shipment_query(filters=None, use_all_data=False):
     """Helper function to build filtered shipment query with configurable data scope"""
     if use_all_data:
@@ -436,15 +487,7 @@ def build_filtered_shipment_query(filters=None, use_all_data=False):
     destination_station = filters.get('destinationStation')
 
     if start_date and end_date:
-        # Filter by arrival_date field (converted to date)
-        query = query.filter(
-            and_(
-                ProcessedShipment.arrival_date.isnot(None),
-                ProcessedShipment.arrival_date != '',
-                func.date(func.substr(ProcessedShipment.arrival_date, 1, 10)) >= start_date,
-                func.date(func.substr(ProcessedShipment.arrival_date, 1, 10)) <= end_date
-            )
-        )
+        query = query.filter(_arrival_date_filter(start_date, end_date))
     
     # Enhanced filtering by origin station
     if origin_station and origin_station != '*':
@@ -468,6 +511,59 @@ def build_filtered_shipment_query(filters=None, use_all_data=False):
     
     return query
 
+def _stream_export_workbook(records, sheet_name):
+    """Write export dicts row by row to an in-memory .xlsx; returns None when there are no records"""
+    first = next(records, None)
+    if first is None:
+        return None
+    headers = list(first.keys())
+
+    output = io.BytesIO()
+    if EXCEL_WRITE_ENGINE == 'xlsxwriter':
+        import xlsxwriter
+        # constant_memory flushes each row to disk as soon as the next one starts
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'strings_to_urls': False})
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, headers, workbook.add_format({'bold': True, 'border': 1, 'align': 'center'}))
+        for row_num, record in enumerate(chain([first], records), start=1):
+            worksheet.write_row(row_num, 0, list(record.values()))
+        workbook.close()
+    else:
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(sheet_name)
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(worksheet, value=header)
+            cell.font = Font(bold=True)
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+        for record in chain([first], records):
+            worksheet.append(list(record.values()))
+        workbook.save(output)
+    output.seek(0)
+    return output
+
+# Export sheet layouts: record formatter and sheet name
+_EXPORT_FORMATS = {
+    'chinapost': (ProcessedShipment.to_chinapost_format, 'CHINAPOST Export'),
+    'cbd': (ProcessedShipment.to_cbd_format, 'CBD Export')
+}
+
+# Holds whole workbooks as bytes, so only the latest couple are kept (and all are dropped on shipment writes)
+@lru_cache(maxsize=2)
+def _cached_export_workbook(export_format, filters_key, use_all_data, data_fingerprint, ttl_bucket):
+    """Memoized export .xlsx bytes, None when nothing matches"""
+    query = build_filtered_shipment_query(json.loads(filters_key) if filters_key else None, use_all_data=use_all_data)
+    to_format, sheet_name = _EXPORT_FORMATS[export_format]
+    
+    # Stream database records in export format straight into the workbook
+    records = (to_format(entry) for entry in query.order_by(ProcessedShipment.id).yield_per(EXPORT_YIELD_PER))
+    output = _stream_export_workbook(records, sheet_name)
+    return output.getvalue() if output is not None else None
+
 @app.route('/generate-chinapost', methods=['POST'])
 def generate_chinapost():
     """Generate CHINAPOST export file with optional filtering"""
@@ -480,28 +576,14 @@ def generate_chinapost():
         end_date = data.get('endDate')
         use_all_data = bool(start_date and end_date)
         
-        # Build filtered query
-        query = build_filtered_shipment_query(data, use_all_data=use_all_data)
-        entries = query.all()
+        # Workbook for these filters, rebuilt only when the matching shipments may have changed
+        workbook = _cached_export_workbook('chinapost', *_shipment_cache_key(data, use_all_data))
         
-        if not entries:
+        if workbook is None:
             return jsonify({"error": "No processed data available for the specified filters"}), 400
         
-        # Convert database records to CHINAPOST format
-        chinapost_data = []
-        for entry in entries:
-            chinapost_data.append(entry.to_chinapost_format())
-        
-        # Create DataFrame and Excel output
-        df = pd.DataFrame(chinapost_data)
-        
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='CHINAPOST Export', index=False)
-        output.seek(0)
-        
         return send_file(
-            output,
+            io.BytesIO(workbook),
             as_attachment=True,
             download_name=f"CHINAPOST_EXPORT_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
@@ -522,28 +604,14 @@ def generate_cbd():
         end_date = data.get('endDate')
         use_all_data = bool(start_date and end_date)
         
-        # Build filtered query
-        query = build_filtered_shipment_query(data, use_all_data=use_all_data)
-        entries = query.all()
+        # Workbook for these filters, rebuilt only when the matching shipments may have changed
+        workbook = _cached_export_workbook('cbd', *_shipment_cache_key(data, use_all_data))
         
-        if not entries:
+        if workbook is None:
             return jsonify({"error": "No processed data available for the specified filters"}), 400
         
-        # Convert database records to CBD format
-        cbd_data = []
-        for entry in entries:
-            cbd_data.append(entry.to_cbd_format())
-        
-        # Create DataFrame and Excel output
-        df = pd.DataFrame(cbd_data)
-        
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='CBD Export', index=False)
-        output.seek(0)
-        
         return send_file(
-            output,
+            io.BytesIO(workbook),
             as_attachment=True,
             download_name=f"CBD_EXPORT_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
@@ -552,6 +620,43 @@ def generate_cbd():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _shipment_dashboard_totals(query):
+    """Dashboard totals in one aggregation: positive weight/value/tariff sums and distinct non-empty dimensions"""
+    return query.with_entities(
+        func.count(ProcessedShipment.id).label('total_shipments'),
+        func.sum(case((ProcessedShipment.bag_weight > 0, ProcessedShipment.bag_weight), else_=0)).label('total_weight'),
+        func.sum(case((ProcessedShipment.declared_value > 0, ProcessedShipment.declared_value), else_=0)).label('total_declared_value'),
+        func.sum(case((ProcessedShipment.tariff_amount > 0, ProcessedShipment.tariff_amount), else_=0)).label('total_tariff'),
+        func.count(distinct(func.nullif(ProcessedShipment.host_destination_station, ''))).label('unique_destinations'),
+        func.count(distinct(func.nullif(ProcessedShipment.flight_carrier_1, ''))).label('unique_carriers'),
+        func.count(distinct(func.nullif(ProcessedShipment.receptacle_id, ''))).label('unique_receptacles'),
+        func.count(distinct(func.nullif(ProcessedShipment.goods_category, ''))).label('unique_categories'),
+        func.count(distinct(func.nullif(ProcessedShipment.postal_service, ''))).label('unique_services')
+    ).one()
+
+# Per-group sums for dashboard breakdowns: weight/tariff include every stored amount, value only positive ones
+_BREAKDOWN_SUMS = {
+    'weight': func.sum(case((ProcessedShipment.bag_weight != 0, ProcessedShipment.bag_weight), else_=0)),
+    'value': func.sum(case((ProcessedShipment.declared_value > 0, ProcessedShipment.declared_value), else_=0)),
+    'tariff': func.sum(case((ProcessedShipment.tariff_amount != 0, ProcessedShipment.tariff_amount), else_=0))
+}
+
+def _shipment_breakdown(query, column, fields):
+    """GROUP BY one shipment column (NULL/empty skipped) with rounded sums, in first-occurrence order"""
+    rows = query.with_entities(
+        column.label('name'),
+        func.count(ProcessedShipment.id).label('count'),
+        *(_BREAKDOWN_SUMS[field].label(field) for field in fields)
+    ).filter(
+        column.isnot(None),
+        column != ''
+    ).group_by(column).order_by(func.min(ProcessedShipment.id)).all()
+    
+    return [
+        {'name': row.name, 'count': row.count, **{field: round(getattr(row, field), 2) for field in fields}}
+        for row in rows
+    ]
+
 @app.route('/get-analytics-data', methods=['GET', 'POST'])
 def get_analytics_data():
     """Get analytics data for dashboard - filters by recent upload OR historical data based on request"""
@@ -562,195 +667,165 @@ def get_analytics_data():
             start_date = data.get('startDate')
             end_date = data.get('endDate')
             
-            if start_date and end_date:
-                # Historical Data request: Query entire database with filters
-                query = build_filtered_shipment_query(data, use_all_data=True)
-            else:
-                # Data Processing request: Use recent upload only
-                query = build_filtered_shipment_query(data, use_all_data=False)
+            # Historical Data request (both dates) queries the entire database; otherwise recent upload only
+            filters, use_all_data = data, bool(start_date and end_date)
         else:
             # GET request: Always use recent upload (from Data Processing tabs)
-            query = build_filtered_shipment_query(None, use_all_data=False)
+            filters, use_all_data = None, False
         
-        # Execute query
-        entries = query.all()
-        
-        if not entries:
-            return jsonify({
-                "analytics": {
-                    "total_shipments": 0,
-                    "total_weight": 0,
-                    "total_declared_value": 0,
-                    "total_tariff": 0,
-                    "unique_destinations": 0,
-                    "unique_carriers": 0,
-                    "unique_receptacles": 0
-                },
-                "breakdown": {
-                    "by_destination": [],
-                    "by_carrier": [],
-                    "by_currency": []
-                }
-            })
-        
-        # Calculate analytics in backend
-        total_weight = 0
-        total_declared_value = 0
-        total_tariff = 0
-        destinations = set()
-        carriers = set()
-        receptacles = set()
-        currencies = {}
-        destination_breakdown = {}
-        carrier_breakdown = {}
-        category_breakdown = {}
-        service_breakdown = {}
-        calculation_method_breakdown = {}
-        
-        for entry in entries:
-            # Weight calculation - handle all forms of invalid values
-            weight = 0
-            try:
-                if entry.bag_weight:
-                    val_str = str(entry.bag_weight).lower().strip()
-                    if val_str not in ['nan', 'null', 'none', '', 'n/a', 'na']:
-                        weight = float(entry.bag_weight)
-                        if not pd.isna(weight) and weight >= 0:
-                            total_weight += weight
-            except (ValueError, TypeError, AttributeError):
-                weight = 0
-            
-            # Declared value calculation - handle all forms of invalid values
-            declared_val = 0
-            try:
-                if entry.declared_value:
-                    val_str = str(entry.declared_value).lower().strip()
-                    if val_str not in ['nan', 'null', 'none', '', 'n/a', 'na']:
-                        declared_val = float(entry.declared_value)
-                        if not pd.isna(declared_val) and declared_val > 0:
-                            total_declared_value += declared_val
-            except (ValueError, TypeError, AttributeError):
-                declared_val = 0
-            
-            # Tariff calculation - handle all forms of invalid values
-            tariff = 0
-            try:
-                if entry.tariff_amount:
-                    val_str = str(entry.tariff_amount).lower().strip()
-                    if val_str not in ['nan', 'null', 'none', '', 'n/a', 'na']:
-                        tariff = float(entry.tariff_amount)
-                        if not pd.isna(tariff) and tariff >= 0:
-                            total_tariff += tariff
-            except (ValueError, TypeError, AttributeError):
-                tariff = 0
-            
-            # Unique counts
-            if entry.host_destination_station:
-                destinations.add(entry.host_destination_station)
-                # Destination breakdown
-                dest = entry.host_destination_station
-                if dest not in destination_breakdown:
-                    destination_breakdown[dest] = {"count": 0, "weight": 0, "value": 0}
-                destination_breakdown[dest]["count"] += 1
-                destination_breakdown[dest]["weight"] += weight
-                if declared_val > 0:
-                    destination_breakdown[dest]["value"] += declared_val
-            
-            if entry.flight_carrier_1:
-                carriers.add(entry.flight_carrier_1)
-                # Carrier breakdown
-                carrier = entry.flight_carrier_1
-                if carrier not in carrier_breakdown:
-                    carrier_breakdown[carrier] = {"count": 0, "weight": 0, "value": 0}
-                carrier_breakdown[carrier]["count"] += 1
-                carrier_breakdown[carrier]["weight"] += weight
-                if declared_val > 0:
-                    carrier_breakdown[carrier]["value"] += declared_val
-            
-            if entry.receptacle_id:
-                receptacles.add(entry.receptacle_id)
-            
-            # Currency breakdown - filter out invalid currency values
-            if entry.currency:
-                curr_str = str(entry.currency).lower().strip()
-                if curr_str not in ['nan', 'null', 'none', '', 'n/a', 'na'] and len(curr_str) <= 10:
-                    if entry.currency not in currencies:
-                        currencies[entry.currency] = 0
-                    currencies[entry.currency] += 1
-            
-            # Category breakdown
-            if entry.goods_category:
-                category = entry.goods_category
-                if category not in category_breakdown:
-                    category_breakdown[category] = {"count": 0, "weight": 0, "value": 0, "tariff": 0}
-                category_breakdown[category]["count"] += 1
-                category_breakdown[category]["weight"] += weight
-                if declared_val > 0:
-                    category_breakdown[category]["value"] += declared_val
-                category_breakdown[category]["tariff"] += tariff
-            
-            # Service breakdown
-            if entry.postal_service:
-                service = entry.postal_service
-                if service not in service_breakdown:
-                    service_breakdown[service] = {"count": 0, "weight": 0, "value": 0, "tariff": 0}
-                service_breakdown[service]["count"] += 1
-                service_breakdown[service]["weight"] += weight
-                if declared_val > 0:
-                    service_breakdown[service]["value"] += declared_val
-                service_breakdown[service]["tariff"] += tariff
-            
-            # Calculation method breakdown
-            if entry.tariff_calculation_method:
-                method = entry.tariff_calculation_method
-                if method not in calculation_method_breakdown:
-                    calculation_method_breakdown[method] = {"count": 0, "value": 0, "tariff": 0}
-                calculation_method_breakdown[method]["count"] += 1
-                if declared_val > 0:
-                    calculation_method_breakdown[method]["value"] += declared_val
-                calculation_method_breakdown[method]["tariff"] += tariff
-        
-        # Format breakdown data
-        dest_data = [{"name": k, "count": v["count"], "weight": round(v["weight"], 2), 
-                     "value": round(v["value"], 2)} for k, v in destination_breakdown.items()]
-        carrier_data = [{"name": k, "count": v["count"], "weight": round(v["weight"], 2), 
-                        "value": round(v["value"], 2)} for k, v in carrier_breakdown.items()]
-        currency_data = [{"name": k, "count": v} for k, v in currencies.items()]
-        category_data = [{"name": k, "count": v["count"], "weight": round(v["weight"], 2), 
-                         "value": round(v["value"], 2), "tariff": round(v["tariff"], 2)} 
-                         for k, v in category_breakdown.items()]
-        service_data = [{"name": k, "count": v["count"], "weight": round(v["weight"], 2), 
-                        "value": round(v["value"], 2), "tariff": round(v["tariff"], 2)} 
-                        for k, v in service_breakdown.items()]
-        method_data = [{"name": k, "count": v["count"], "value": round(v["value"], 2), 
-                       "tariff": round(v["tariff"], 2)} 
-                       for k, v in calculation_method_breakdown.items()]
-        
-        return jsonify({
-            "analytics": {
-                "total_shipments": len(entries),
-                "total_weight": round(total_weight, 2),
-                "total_declared_value": round(total_declared_value, 2),
-                "total_tariff": round(total_tariff, 2),
-                "unique_destinations": len(destinations),
-                "unique_carriers": len(carriers),
-                "unique_receptacles": len(receptacles),
-                "unique_categories": len(category_breakdown),
-                "unique_services": len(service_breakdown)
-            },
-            "breakdown": {
-                "by_destination": dest_data,
-                "by_carrier": carrier_data,
-                "by_currency": currency_data,
-                "by_category": category_data,
-                "by_service": service_data,
-                "by_calculation_method": method_data
-            }
-        })
+        return jsonify(_cached_analytics_payload(*_shipment_cache_key(filters, use_all_data)))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Persisted shipment write version and most recent upload id, shared by every worker process
+_SHIPMENT_DATA_VERSION = select(SystemConfig.config_value).where(
+    SystemConfig.config_key == SHIPMENT_DATA_VERSION_KEY
+).scalar_subquery()
+_RECENT_UPLOAD_ID = select(FileUploadHistory.id).where(
+    FileUploadHistory.processing_status == 'processed'
+).order_by(FileUploadHistory.upload_timestamp.desc()).limit(1).scalar_subquery()
+
+def _shipment_data_fingerprint(use_all_data):
+    """Shipment write version (and recent upload scope) in one query; changes whenever any process commits a shipment write"""
+    if use_all_data:
+        return db.session.query(_SHIPMENT_DATA_VERSION).scalar()
+    return tuple(db.session.query(_SHIPMENT_DATA_VERSION, _RECENT_UPLOAD_ID).one())
+
+def _shipment_cache_key(filters, use_all_data):
+    """
+    Arguments for the memoized shipment views: (filters_key, use_all_data, data_fingerprint, ttl_bucket).
+    The memoized shipment helpers never read their data_fingerprint and ttl_bucket arguments; those only make
+    lru_cache miss once shipments change or the TTL elapses.
+    """
+    return (
+        json.dumps(filters, sort_keys=True, default=str) if filters else None, use_all_data,
+        _shipment_data_fingerprint(use_all_data), int(time.monotonic() // SHIPMENT_CACHE_TTL_SECONDS)
+    )
+
+@lru_cache(maxsize=128)
+def _cached_analytics_payload(filters_key, use_all_data, data_fingerprint, ttl_bucket):
+    """Memoized dashboard analytics payload for one filter set"""
+    query = build_filtered_shipment_query(json.loads(filters_key) if filters_key else None, use_all_data=use_all_data)
+    
+    # Totals and per-dimension breakdowns are aggregated in SQL; no shipment rows are loaded
+    totals = _shipment_dashboard_totals(query)
+    
+    return {
+        "analytics": {
+            "total_shipments": totals.total_shipments,
+            "total_weight": round(totals.total_weight or 0, 2),
+            "total_declared_value": round(totals.total_declared_value or 0, 2),
+            "total_tariff": round(totals.total_tariff or 0, 2),
+            "unique_destinations": totals.unique_destinations,
+            "unique_carriers": totals.unique_carriers,
+            "unique_receptacles": totals.unique_receptacles,
+            "unique_categories": totals.unique_categories,
+            "unique_services": totals.unique_services
+        },
+        "breakdown": {
+            "by_destination": _shipment_breakdown(query, ProcessedShipment.host_destination_station, ('weight', 'value')),
+            "by_carrier": _shipment_breakdown(query, ProcessedShipment.flight_carrier_1, ('weight', 'value')),
+            # Currency breakdown filters out invalid currency values
+            "by_currency": [{"name": k, "count": v["count"]} for k, v in _shipment_currency_breakdown(query).items()],
+            "by_category": _shipment_breakdown(query, ProcessedShipment.goods_category, ('weight', 'value', 'tariff')),
+            "by_service": _shipment_breakdown(query, ProcessedShipment.postal_service, ('weight', 'value', 'tariff')),
+            "by_calculation_method": _shipment_breakdown(query, ProcessedShipment.tariff_calculation_method, ('value', 'tariff'))
+        }
+    }
+
+def invalidate_shipment_caches():
+    """Drop every memoized shipment result held by this process"""
+    for cached_view in (_cached_analytics_payload, _cached_export_workbook,
+                        _cached_system_tariff_totals, _cached_classification_values):
+        cached_view.cache_clear()
+
+# Increments the persisted shipment write version (created on first use), in the writing transaction itself
+_BUMP_SHIPMENT_DATA_VERSION = sqlite_insert(SystemConfig.__table__).values(
+    config_key=SHIPMENT_DATA_VERSION_KEY,
+    config_value='1',
+    config_type='int',
+    description='Incremented by every transaction that writes processed shipments (cache validator)'
+).on_conflict_do_update(
+    index_elements=['config_key'],
+    set_={'config_value': func.cast(func.cast(SystemConfig.__table__.c.config_value, db.Integer) + 1, db.String)}
+)
+
+def _mark_shipments_written(session):
+    """Bump the shipment write version once per transaction and flag the session for cache expiry on commit"""
+    if not session.info.get('shipments_written'):
+        session.connection().execute(_BUMP_SHIPMENT_DATA_VERSION)
+        session.info['shipments_written'] = True
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _track_bulk_shipment_writes(orm_execute_state):
+    """Mark the session when a bulk INSERT/UPDATE/DELETE statement targets the shipment table"""
+    if ((orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete) and
+            orm_execute_state.statement.table.name == ProcessedShipment.__tablename__):
+        _mark_shipments_written(orm_execute_state.session)
+
+@event.listens_for(db.session, 'after_flush')
+def _track_flushed_shipment_writes(session, flush_context):
+    """Mark the session (once per flush, not per row) when the flush wrote shipment objects"""
+    if any(isinstance(obj, ProcessedShipment) for obj in chain(session.new, session.dirty, session.deleted)):
+        _mark_shipments_written(session)
+
+# Other requests only see the bumped version once the write commits, so they can't cache uncommitted or
+# pre-write rows under it
+@event.listens_for(db.session, 'after_commit')
+def _expire_shipment_caches_on_commit(session):
+    """Drop memoized export workbooks when the committed transaction wrote shipments"""
+    # Their keys already carry the old write version; this only stops stale workbooks holding memory
+    if session.info.pop('shipments_written', False):
+        _cached_export_workbook.cache_clear()
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_shipment_writes(session):
+    """Drop everything this process memoized when a shipment write rolls back"""
+    # A read inside the writing transaction may have cached rolled-back rows under a version number the
+    # next write will reuse
+    if session.info.pop('shipments_written', False):
+        invalidate_shipment_caches()
+
+# Tariff rate and system config state for ETag validators (the shipment write version row is left out of the
+# config state so shipment writes don't invalidate config-only responses)
+_TARIFF_RATE_STATE = (
+    select(func.max(TariffRate.updated_at)).scalar_subquery(),
+    select(func.count(TariffRate.id)).scalar_subquery()
+)
+_SYSTEM_CONFIG_STATE = (
+    select(func.max(SystemConfig.updated_at)).where(SystemConfig.config_key != SHIPMENT_DATA_VERSION_KEY).scalar_subquery(),
+    select(func.count(SystemConfig.id)).where(SystemConfig.config_key != SHIPMENT_DATA_VERSION_KEY).scalar_subquery()
+)
+
+def _etag_cached(*state):
+    """
+    Answer GET requests with an ETag and 304 Not Modified when the client's copy is still current.
+    The ETag hashes the request path with the given state expressions, read in one query; they must cover
+    everything the endpoint's response depends on and be shared by all worker processes.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            
+            current_state = tuple(db.session.query(*state).one())
+            etag = hashlib.sha1(repr((request.full_path, current_state)).encode('utf-8')).hexdigest()
+            if etag in request.if_none_match:
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            # Clients may keep the payload but must revalidate it, so fresh uploads show up immediately
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
 @app.route('/delete-records', methods=['DELETE'])
 def delete_records():
     """Delete multiple shipment records by IDs"""
@@ -761,13 +836,14 @@ def delete_records():
         if not record_ids:
             return jsonify({"error": "No record IDs provided"}), 400
         
-        # Delete records
+        # Delete records with one bulk DELETE per chunk of ids (no per-row SELECT or ORM load)
+        record_ids = list(dict.fromkeys(record_ids))
         deleted_count = 0
-        for record_id in record_ids:
-            entry = ProcessedShipment.query.get(record_id)
-            if entry:
-                db.session.delete(entry)
-                deleted_count += 1
+        for offset in range(0, len(record_ids), SHIPMENT_DELETE_CHUNK_SIZE):
+            chunk = record_ids[offset:offset + SHIPMENT_DELETE_CHUNK_SIZE]
+            deleted_count += ProcessedShipment.query.filter(
+                ProcessedShipment.id.in_(chunk)
+            ).delete(synchronize_session=False)
         
         db.session.commit()
         
@@ -784,8 +860,8 @@ def delete_records():
 def clear_database():
     """Clear all records from database"""
     try:
-        deleted_count = ProcessedShipment.query.count()
-        ProcessedShipment.query.delete()
+        # A single unfiltered DELETE; its rowcount replaces a separate COUNT(*) scan
+        deleted_count = ProcessedShipment.query.delete(synchronize_session=False)
         db.session.commit()
         
         return jsonify({
@@ -804,7 +880,7 @@ def get_tariff_routes():
     """Get all unique routes from shipment data and their current tariff rates"""
     try:
         # Get all unique origin-destination pairs from processed shipments
-        routes_query = db.session.query(
+        routes_subquery = db.session.query(
             ProcessedShipment.host_origin_station,
             ProcessedShipment.host_destination_station,
             func.count(ProcessedShipment.id).label('shipment_count'),
@@ -820,6 +896,34 @@ def get_tariff_routes():
         ).group_by(
             ProcessedShipment.host_origin_station,
             ProcessedShipment.host_destination_station
+        ).subquery()
+        
+        # First configured tariff rate per route (in route lookup index order: category, service, dates, weights),
+        # so the join yields at most one rate per route
+        ranked_rates = db.session.query(
+            TariffRate.id.label('rate_id'),
+            TariffRate.origin_country,
+            TariffRate.destination_country,
+            func.row_number().over(
+                partition_by=(TariffRate.origin_country, TariffRate.destination_country),
+                order_by=(TariffRate.goods_category, TariffRate.postal_service, TariffRate.start_date,
+                          TariffRate.end_date, TariffRate.min_weight, TariffRate.max_weight, TariffRate.id)
+            ).label('route_rank')
+        ).subquery()
+        
+        # Routes and their configured rates in one statement instead of a rate lookup per route
+        routes_query = db.session.query(routes_subquery, TariffRate).outerjoin(
+            ranked_rates,
+            and_(
+                ranked_rates.c.origin_country == routes_subquery.c.host_origin_station,
+                ranked_rates.c.destination_country == routes_subquery.c.host_destination_station,
+                ranked_rates.c.route_rank == 1
+            )
+        ).outerjoin(
+            TariffRate, TariffRate.id == ranked_rates.c.rate_id
+        ).order_by(
+            routes_subquery.c.host_origin_station,
+            routes_subquery.c.host_destination_station
         ).all()
         
         routes = []
@@ -827,11 +931,8 @@ def get_tariff_routes():
             origin = route.host_origin_station
             destination = route.host_destination_station
             
-            # Check if we have a configured tariff rate for this route
-            tariff_rate_config = TariffRate.query.filter_by(
-                origin_country=origin,
-                destination_country=destination
-            ).first()
+            # Configured tariff rate for this route, if any
+            tariff_rate_config = route.TariffRate
             
             # Calculate effective rate from historical data
             historical_rate = 0.0
@@ -914,16 +1015,23 @@ def get_stations():
 def get_tariff_rates():
     """Get all configured tariff rates"""
     try:
-        tariff_rates = TariffRate.query.filter_by(is_active=True).all()
+        tariff_rates = TariffRate.query.filter_by(is_active=True).with_entities(*TariffRate.__table__.columns).all()
         
         return jsonify({
-            'tariff_rates': [rate.to_dict() for rate in tariff_rates],
+            'tariff_rates': [TariffRate.row_to_dict(rate) for rate in tariff_rates],
             'total_rates': len(tariff_rates)
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Request fields accepted by the tariff rate create/update endpoints (validated by _validate_tariff_rate_data)
+_TARIFF_RATE_FIELDS = (
+    'origin_country', 'destination_country', 'goods_category', 'postal_service',
+    'start_date', 'end_date', 'min_weight', 'max_weight', 'tariff_rate',
+    'category_surcharge', 'minimum_tariff', 'maximum_tariff', 'currency', 'is_active', 'notes'
+)
+
 def _validate_tariff_rate_data(data):
     """Centralized validation for tariff rate data"""
     origin = data.get('origin_country')
@@ -933,10 +1041,11 @@ def _validate_tariff_rate_data(data):
         return {'error': 'Origin and destination countries are required'}, 400
     
     # Parse and validate dates
-    from datetime import datetime, date
+    start_value = data.get('start_date')
+    end_value = data.get('end_date')
     try:
-        start_date = datetime.strptime(data.get('start_date'), '%Y-%m-%d').date() if data.get('start_date') else date.today()
-        end_date = datetime.strptime(data.get('end_date'), '%Y-%m-%d').date() if data.get('end_date') else date(2099, 12, 31)
+        start_date = date.fromisoformat(start_value) if start_value else date.today()
+        end_date = date.fromisoformat(end_value) if end_value else date(2099, 12, 31)
     except (ValueError, TypeError) as e:
         return {'error': f'Invalid date format: {str(e)}'}, 400
     
@@ -965,6 +1074,8 @@ def _validate_tariff_rate_data(data):
     except (ValueError, TypeError):
         return {'error': 'Invalid tariff_rate value'}, 400
     
+    maximum_tariff = data.get('maximum_tariff')
+    
     return {
         'origin': origin,
         'destination': destination,
@@ -977,7 +1088,7 @@ def _validate_tariff_rate_data(data):
         'tariff_rate': tariff_rate,
         'category_surcharge': float(data.get('category_surcharge', 0.0)),
         'minimum_tariff': float(data.get('minimum_tariff', 0.0)),
-        'maximum_tariff': float(data.get('maximum_tariff')) if data.get('maximum_tariff') else None,
+        'maximum_tariff': float(maximum_tariff) if maximum_tariff else None,
         'currency': data.get('currency', 'USD'),
         'is_active': data.get('is_active', True),
         'notes': data.get('notes', '')
@@ -999,19 +1110,43 @@ def _check_rate_conflicts(validated_data, exclude_id=None):
     )
     
     if conflicting_rates:
-        conflict_info = [{
-            'id': rate.id,
-            'start_date': rate.start_date.isoformat(),
-            'end_date': rate.end_date.isoformat(),
-            'min_weight': rate.min_weight,
-            'max_weight': rate.max_weight,
-            'rate': rate.tariff_rate
-        } for rate in conflicting_rates]
-        
-        return {'error': 'Rate conflicts with existing rates (date/weight range overlap)', 'conflicting_rates': conflict_info}, 400
+        return _format_rate_conflicts(conflicting_rates)
     
     return None, None
 
+def _format_rate_conflicts(conflicting_rates):
+    """Build the error response for rates that overlap an existing date/weight range"""
+    conflict_info = [{
+        'id': rate.id,
+        'start_date': rate.start_date.isoformat(),
+        'end_date': rate.end_date.isoformat(),
+        'min_weight': rate.min_weight,
+        'max_weight': rate.max_weight,
+        'rate': rate.tariff_rate
+    } for rate in conflicting_rates]
+    
+    return {'error': 'Rate conflicts with existing rates (date/weight range overlap)', 'conflicting_rates': conflict_info}, 400
+
+def _find_existing_rate_or_conflicts(validated_data):
+    """Exact-match lookup and conflict check in a single query for create/upsert endpoints"""
+    existing_rate, conflicting_rates = TariffRate.find_exact_match_or_conflicts(
+        validated_data['origin'],
+        validated_data['destination'],
+        validated_data['goods_category'],
+        validated_data['postal_service'],
+        validated_data['start_date'],
+        validated_data['end_date'],
+        validated_data['min_weight'],
+        validated_data['max_weight']
+    )
+    
+    # Conflicts only matter if we are not updating an exact match
+    if conflicting_rates:
+        conflict_result, conflict_error = _format_rate_conflicts(conflicting_rates)
+        return existing_rate, conflict_result, conflict_error
+    
+    return existing_rate, None, None
+
 def _create_or_update_rate(validated_data, existing_rate=None):
     """Create new rate or update existing one"""
     if existing_rate:
@@ -1052,33 +1187,25 @@ def create_single_tariff_rate():
         if error:
             return jsonify(validated_data), error
         
-        # Check for existing exact match first
-        existing_rate = TariffRate.query.filter_by(
-            origin_country=validated_data['origin'],
-            destination_country=validated_data['destination'],
-            goods_category=validated_data['goods_category'],
-            postal_service=validated_data['postal_service'],
-            start_date=validated_data['start_date'],
-            end_date=validated_data['end_date'],
-            min_weight=validated_data['min_weight'],
-            max_weight=validated_data['max_weight']
-        ).first()
-        
-        # Check for conflicts only if not updating exact match
-        if not existing_rate:
-            conflict_result, conflict_error = _check_rate_conflicts(validated_data)
-            if conflict_error:
-                return jsonify(conflict_result), conflict_error
+        # Look up exact match and conflicts together (one round-trip)
+        existing_rate, conflict_result, conflict_error = _find_existing_rate_or_conflicts(validated_data)
+        if conflict_error:
+            return jsonify(conflict_result), conflict_error
         
         # Create or update rate
         rate, is_new = _create_or_update_rate(validated_data, existing_rate)
         
+        # Flush issues the INSERT/UPDATE and picks up the new id from the same statement;
+        # serializing before commit keeps expire_on_commit from forcing a refresh SELECT
+        db.session.flush()
+        rate_payload = rate.to_dict()
+        
         # Single commit
         db.session.commit()
         
         return jsonify({
             'message': f'Single tariff rate {"created" if is_new else "updated"} successfully',
-            'tariff_rate': rate.to_dict(),
+            'tariff_rate': rate_payload,
             'applies_to': 'all_categories',
             'note': 'This rate applies to all goods categories for this route'
         }), 201 if is_new else 200
@@ -1101,33 +1228,25 @@ def create_tariff_rate():
         if error:
             return jsonify(validated_data), error
         
-        # Check for existing exact match first
-        existing_rate = TariffRate.query.filter_by(
-            origin_country=validated_data['origin'],
-            destination_country=validated_data['destination'],
-            goods_category=validated_data['goods_category'],
-            postal_service=validated_data['postal_service'],
-            start_date=validated_data['start_date'],
-            end_date=validated_data['end_date'],
-            min_weight=validated_data['min_weight'],
-            max_weight=validated_data['max_weight']
-        ).first()
-        
-        # Check for conflicts only if not updating exact match
-        if not existing_rate:
-            conflict_result, conflict_error = _check_rate_conflicts(validated_data)
-            if conflict_error:
-                return jsonify(conflict_result), conflict_error
+        # Look up exact match and conflicts together (one round-trip)
+        existing_rate, conflict_result, conflict_error = _find_existing_rate_or_conflicts(validated_data)
+        if conflict_error:
+            return jsonify(conflict_result), conflict_error
         
         # Create or update rate
         rate, is_new = _create_or_update_rate(validated_data, existing_rate)
         
+        # Flush issues the INSERT/UPDATE and picks up the new id from the same statement;
+        # serializing before commit keeps expire_on_commit from forcing a refresh SELECT
+        db.session.flush()
+        rate_payload = rate.to_dict()
+        
         # Single commit
         db.session.commit()
         
         return jsonify({
             'message': f'Tariff rate {"created" if is_new else "updated"} successfully',
-            'tariff_rate': rate.to_dict()
+            'tariff_rate': rate_payload
         }), 201 if is_new else 200
         
     except ValueError as e:
@@ -1148,23 +1267,10 @@ def update_tariff_rate(rate_id):
         data = request.json or {}
         
         # Merge existing data with updates for validation
-        update_data = {
-            'origin_country': data.get('origin_country', rate.origin_country),
-            'destination_country': data.get('destination_country', rate.destination_country),
-            'goods_category': data.get('goods_category', rate.goods_category),
-            'postal_service': data.get('postal_service', rate.postal_service),
-            'start_date': data.get('start_date', rate.start_date.isoformat() if rate.start_date else None),
-            'end_date': data.get('end_date', rate.end_date.isoformat() if rate.end_date else None),
-            'min_weight': data.get('min_weight', rate.min_weight),
-            'max_weight': data.get('max_weight', rate.max_weight),
-            'tariff_rate': data.get('tariff_rate', rate.tariff_rate),
-            'category_surcharge': data.get('category_surcharge', rate.category_surcharge),
-            'minimum_tariff': data.get('minimum_tariff', rate.minimum_tariff),
-            'maximum_tariff': data.get('maximum_tariff', rate.maximum_tariff),
-            'currency': data.get('currency', rate.currency),
-            'is_active': data.get('is_active', rate.is_active),
-            'notes': data.get('notes', rate.notes)
-        }
+        update_data = {field: getattr(rate, field) for field in _TARIFF_RATE_FIELDS}
+        for field in ('start_date', 'end_date'):
+            update_data[field] = update_data[field].isoformat() if update_data[field] else None
+        update_data.update((field, data[field]) for field in _TARIFF_RATE_FIELDS if field in data)
         
         # Validate input data
         validated_data, error = _validate_tariff_rate_data(update_data)
@@ -1227,16 +1333,26 @@ def delete_tariff_rate(rate_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@lru_cache(maxsize=1)
+def _cached_system_tariff_totals(data_fingerprint, ttl_bucket):
+    """Memoized system-wide shipment totals in one aggregation"""
+    return db.session.query(
+        func.sum(func.cast(ProcessedShipment.declared_value, db.Float)).label('total_declared_value'),
+        func.sum(func.cast(ProcessedShipment.tariff_amount, db.Float)).label('total_tariff_amount'),
+        func.count(ProcessedShipment.id).label('total_shipments'),
+        func.min(func.cast(ProcessedShipment.tariff_amount, db.Float)).label('min_tariff_amount'),
+        func.max(func.cast(ProcessedShipment.tariff_amount, db.Float)).label('max_tariff_amount')
+    ).one()
+
 @app.route('/tariff-system-defaults', methods=['GET'])
+@_etag_cached(_SHIPMENT_DATA_VERSION, *_TARIFF_RATE_STATE, *_SYSTEM_CONFIG_STATE)
 def get_tariff_system_defaults():
     """Get system defaults for tariff management"""
     try:
-        # Calculate system-wide average rate from all processed shipments
-        totals_query = db.session.query(
-            func.sum(func.cast(ProcessedShipment.declared_value, db.Float)).label('total_declared_value'),
-            func.sum(func.cast(ProcessedShipment.tariff_amount, db.Float)).label('total_tariff_amount'),
-            func.count(ProcessedShipment.id).label('total_shipments')
-        ).first()
+        # System-wide totals and tariff range from all processed shipments (memoized until shipments change)
+        totals_query = _cached_system_tariff_totals(
+            _shipment_data_fingerprint(use_all_data=True), int(time.monotonic() // SHIPMENT_CACHE_TTL_SECONDS)
+        )
         
         system_average_rate = 0.0
         if (totals_query and 
@@ -1246,8 +1362,8 @@ def get_tariff_system_defaults():
             system_average_rate = totals_query.total_tariff_amount / totals_query.total_declared_value
         
         # Get common ranges from existing data
-        min_tariff_query = db.session.query(func.min(func.cast(ProcessedShipment.tariff_amount, db.Float))).scalar() or 0.0
-        max_tariff_query = db.session.query(func.max(func.cast(ProcessedShipment.tariff_amount, db.Float))).scalar() or 100.0
+        min_tariff_query = totals_query.min_tariff_amount or 0.0
+        max_tariff_query = totals_query.max_tariff_amount or 100.0
         
         return jsonify({
             'system_defaults': {
@@ -1284,14 +1400,7 @@ def calculate_tariff():
             return jsonify({'error': 'Valid origin, destination, and declared value are required'}), 400
         
         # Parse ship_date if provided
-        from datetime import datetime, date
-        if ship_date:
-            try:
-                ship_date = datetime.strptime(ship_date, '%Y-%m-%d').date()
-            except:
-                ship_date = date.today()
-        else:
-            ship_date = date.today()
+        ship_date = _parse_iso_date(ship_date, date.today())
         
         # Use the enhanced tariff calculation with weight filtering
         result = TariffRate.calculate_tariff_for_shipment(
@@ -1363,36 +1472,54 @@ def calculate_tariff():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@lru_cache(maxsize=4)
+def _cached_classification_values(rate_column_name, shipment_column_name, extra_values, data_fingerprint, ttl_bucket):
+    """Memoized distinct non-empty values from active tariff rates, processed shipments and extra values (one UNION query)"""
+    selects = [
+        select(getattr(TariffRate, rate_column_name).label('value')).where(TariffRate.is_active == True),
+        select(getattr(ProcessedShipment, shipment_column_name).label('value'))
+    ]
+    selects.extend(select(literal(value).label('value')) for value in extra_values)
+    combined = union(*selects).subquery()
+    
+    rows = db.session.execute(
+        select(combined.c.value).where(
+            combined.c.value.isnot(None),
+            combined.c.value != '',
+            combined.c.value != '*'
+        ).order_by(combined.c.value)
+    ).all()
+    return tuple(row[0] for row in rows)
+
+def _distinct_classification_values(rate_column, shipment_column, extra_values=()):
+    """Distinct non-empty values from active tariff rates and processed shipments, deduplicated and sorted by the database"""
+    # Reused until shipments or tariff rates change
+    data_fingerprint = tuple(db.session.query(_SHIPMENT_DATA_VERSION, *_TARIFF_RATE_STATE).one())
+    return list(_cached_classification_values(
+        rate_column.key, shipment_column.key, tuple(extra_values), data_fingerprint,
+        int(time.monotonic() // SHIPMENT_CACHE_TTL_SECONDS)
+    ))
+
 @app.route('/tariff-categories', methods=['GET'])
+@_etag_cached(_SHIPMENT_DATA_VERSION, *_TARIFF_RATE_STATE, *_SYSTEM_CONFIG_STATE)
 def get_tariff_categories():
     """Get all available goods categories from predefined mappings, configured rates and processed shipments"""
     try:
-        # Start with predefined categories from classification config
+        # Predefined categories from classification config are merged into the same UNION query
         from config.classification import get_category_mappings
         category_mappings = get_category_mappings()
-        categories = set(['*'])  # Always include wildcard
-        categories.update(category_mappings.keys())  # Add all predefined categories
         
-        # Get categories from configured rates
-        rate_categories = db.session.query(TariffRate.goods_category).filter(
-            TariffRate.is_active == True,
-            TariffRate.goods_category != '*'
-        ).distinct().all()
-        
-        # Get categories from processed shipments
-        shipment_categories = db.session.query(ProcessedShipment.goods_category).filter(
-            ProcessedShipment.goods_category.isnot(None),
-            ProcessedShipment.goods_category != ''
-        ).distinct().all()
-        
-        # Add categories from rates and shipments
-        categories.update([c[0] for c in rate_categories if c[0]])
-        categories.update([c[0] for c in shipment_categories if c[0]])
+        # Always include wildcard first
+        categories = ['*'] + _distinct_classification_values(
+            TariffRate.goods_category,
+            ProcessedShipment.goods_category,
+            extra_values=category_mappings.keys()
+        )
         
         return jsonify({
-            'categories': sorted(list(categories)),
+            'categories': categories,
             'total_categories': len(categories),
-            'predefined_categories': sorted(list(category_mappings.keys())),
+            'predefined_categories': sorted(category_mappings.keys()),
             'total_predefined': len(category_mappings)
         })
         
@@ -1400,27 +1527,18 @@ def get_tariff_categories():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/tariff-services', methods=['GET'])
+@_etag_cached(_SHIPMENT_DATA_VERSION, *_TARIFF_RATE_STATE)
 def get_tariff_services():
     """Get all available postal services from configured rates and processed shipments"""
     try:
-        # Get services from configured rates
-        rate_services = db.session.query(TariffRate.postal_service).filter(
-            TariffRate.is_active == True,
-            TariffRate.postal_service != '*'
-        ).distinct().all()
-        
-        # Get services from processed shipments
-        shipment_services = db.session.query(ProcessedShipment.postal_service).filter(
-            ProcessedShipment.postal_service.isnot(None),
-            ProcessedShipment.postal_service != ''
-        ).distinct().all()
-        
-        services = set(['*'])  # Always include wildcard
-        services.update([s[0] for s in rate_services if s[0]])
-        services.update([s[0] for s in shipment_services if s[0]])
+        # Always include wildcard first
+        services = ['*'] + _distinct_classification_values(
+            TariffRate.postal_service,
+            ProcessedShipment.postal_service
+        )
         
         return jsonify({
-            'services': sorted(list(services)),
+            'services': services,
             'total_services': len(services)
         })
         
@@ -1441,14 +1559,7 @@ def test_enhanced_filters():
         start_date = data.get('startDate')
         end_date = data.get('endDate')
         if start_date and end_date:
-            query = query.filter(
-                and_(
-                    ProcessedShipment.arrival_date.isnot(None),
-                    ProcessedShipment.arrival_date != '',
-                    func.date(func.substr(ProcessedShipment.arrival_date, 1, 10)) >= start_date,
-                    func.date(func.substr(ProcessedShipment.arrival_date, 1, 10)) <= end_date
-                )
-            )
+            query = query.filter(_arrival_date_filter(start_date, end_date))
             filters_applied.append(f"Date: {start_date} to {end_date}")
         
         # Category filtering
@@ -1469,15 +1580,16 @@ def test_enhanced_filters():
             query = query.filter(ProcessedShipment.tariff_calculation_method == calculation_method)
             filters_applied.append(f"Method: {calculation_method}")
         
-        # Execute query
-        results = query.all()
+        # Count in the database and only load the sample rows
+        total_results = query.with_entities(func.count(ProcessedShipment.id)).scalar() or 0
+        sample_rows = query.order_by(ProcessedShipment.id).limit(3).all()
         
         return jsonify({
             'success': True,
             'filters_applied': filters_applied,
-            'total_results': len(results),
-            'message': f'Enhanced filtering test completed. Applied {len(filters_applied)} filters, found {len(results)} matching records.',
-            'sample_data': [result.to_dict() for result in results[:3]] if results else []
+            'total_results': total_results,
+            'message': f'Enhanced filtering test completed. Applied {len(filters_applied)} filters, found {total_results} matching records.',
+            'sample_data': [row.to_dict() for row in sample_rows]
         })
         
     except Exception as e:
@@ -1486,165 +1598,109 @@ def test_enhanced_filters():
             'error': str(e)
         }), 500
 
-@app.route('/cbp-analytics', methods=['GET', 'POST'])
-def get_cbp_analytics():
-    """Get CBP-specific analytics from most recent upload only - BACKEND PROCESSED ONLY"""
+def _shipment_analytics_totals(query):
+    """Single aggregation pass over the filtered shipments computing every CBP and China Post total"""
+    return query.with_entities(
+        func.count(ProcessedShipment.id).label('total_records'),
+        # CBP sums every stored declared value; China Post only counts positive values and non-negative weights
+        func.sum(ProcessedShipment.declared_value).label('total_value'),
+        func.sum(case((ProcessedShipment.declared_value > 0, ProcessedShipment.declared_value))).label('total_declared_value'),
+        func.sum(case((ProcessedShipment.bag_weight >= 0, ProcessedShipment.bag_weight))).label('total_weight'),
+        func.sum(ProcessedShipment.tariff_amount).label('total_tariff'),
+        # Unique counts ignore NULL and empty strings
+        func.count(distinct(func.nullif(ProcessedShipment.carrier_code, ''))).label('unique_cbp_carriers'),
+        func.count(distinct(func.nullif(ProcessedShipment.arrival_port_code, ''))).label('unique_ports'),
+        func.count(distinct(func.nullif(ProcessedShipment.flight_carrier_1, ''))).label('unique_carriers'),
+        func.count(distinct(func.nullif(ProcessedShipment.host_destination_station, ''))).label('unique_destinations'),
+        func.count(distinct(func.nullif(ProcessedShipment.flight_number_1, ''))).label('unique_flights')
+    ).one()
+
+def _shipment_currency_breakdown(query):
+    """Count and positive declared value per currency, grouped in SQL with invalid currency tokens filtered out"""
+    currency_token = func.lower(func.trim(ProcessedShipment.currency))
+    rows = query.with_entities(
+        ProcessedShipment.currency,
+        func.count(ProcessedShipment.id).label('count'),
+        func.sum(case((ProcessedShipment.declared_value > 0, ProcessedShipment.declared_value), else_=0)).label('total_value')
+    ).filter(
+        ProcessedShipment.currency.isnot(None),
+        currency_token.notin_(sorted(_BAD_CURRENCY)),
+        func.length(currency_token) <= 10
+    ).group_by(ProcessedShipment.currency).order_by(func.min(ProcessedShipment.id)).all()
+    
+    # Ordered by first occurrence so list-style consumers keep the original row order
+    return {row.currency: {'count': row.count, 'totalValue': row.total_value} for row in rows}
+
+def _cbp_analytics_payload(totals):
+    """Build the CBP analytics response from the shared aggregation row (all zeros when nothing matched)"""
+    total_records = totals.total_records
+    total_value = totals.total_value or 0
+    return {
+        'total_value': round(total_value, 2),
+        'total_records': total_records,
+        'unique_carriers': totals.unique_cbp_carriers,
+        'unique_ports': totals.unique_ports,
+        'average_value': round(total_value / total_records, 2) if total_records else 0
+    }
+
+def _chinapost_analytics_payload(totals, currencies):
+    """Build the China Post analytics response from the shared aggregation row (all zeros when nothing matched)"""
+    total_records = totals.total_records
+    total_weight = totals.total_weight or 0
+    total_declared_value = totals.total_declared_value or 0
+    return {
+        'total_weight': round(total_weight, 2),
+        'total_declared_value': round(total_declared_value, 2),
+        'total_records': total_records,
+        'total_tariff': round(totals.total_tariff or 0, 2),
+        'unique_carriers': totals.unique_carriers,
+        'unique_destinations': totals.unique_destinations,
+        'unique_flights': totals.unique_flights,
+        'average_weight': round(total_weight / total_records, 2) if total_records else 0,
+        'average_value': round(total_declared_value / total_records, 2) if total_records else 0,
+        'currency_breakdown': currencies
+    }
+
+@app.route('/analytics/summary', methods=['GET', 'POST'])
+@_etag_cached(_SHIPMENT_DATA_VERSION, _RECENT_UPLOAD_ID)
+def get_analytics_summary():
+    """Get CBP and China Post analytics together from one aggregation query - most recent upload only"""
     try:
         # Always use data from most recent upload only
-        most_recent_upload_id = FileUploadHistory.get_most_recent_upload_id()
-        
-        if most_recent_upload_id:
-            query = ProcessedShipment.query.filter(ProcessedShipment.file_upload_id == most_recent_upload_id)
-        else:
-            query = ProcessedShipment.query
-        
-        entries = query.all()
-        
-        if not entries:
-            return jsonify({
-                'total_value': 0,
-                'total_records': 0,
-                'unique_carriers': 0,
-                'unique_ports': 0,
-                'average_value': 0
-            })
-        
-        # Calculate CBP-specific analytics in backend
-        total_value = 0
-        carriers = set()
-        ports = set()
-        
-        for entry in entries:
-            # Declared value calculation - handle 'nan' string values properly
-            try:
-                if entry.declared_value and str(entry.declared_value).lower() not in ['nan', 'null', 'none', '']:
-                    # Try to convert to float, skip if it's actually the string 'nan'
-                    if str(entry.declared_value).lower() != 'nan':
-                        declared_val = float(entry.declared_value)
-                        total_value += declared_val
-            except (ValueError, TypeError):
-                pass
-            
-            # Unique carriers and ports
-            if entry.carrier_code:
-                carriers.add(entry.carrier_code)
-            if entry.arrival_port_code:
-                ports.add(entry.arrival_port_code)
+        query = build_filtered_shipment_query(None, use_all_data=False)
+        totals = _shipment_analytics_totals(query)
+        currencies = _shipment_currency_breakdown(query)
         
         return jsonify({
-            'total_value': round(total_value, 2),
-            'total_records': len(entries),
-            'unique_carriers': len(carriers),
-            'unique_ports': len(ports),
-            'average_value': round(total_value / len(entries), 2) if len(entries) > 0 else 0
+            'cbp': _cbp_analytics_payload(totals),
+            'chinapost': _chinapost_analytics_payload(totals, currencies)
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/cbp-analytics', methods=['GET', 'POST'])
+@_etag_cached(_SHIPMENT_DATA_VERSION, _RECENT_UPLOAD_ID)
+def get_cbp_analytics():
+    """Get CBP-specific analytics from most recent upload only - BACKEND PROCESSED ONLY"""
+    try:
+        # Always use data from most recent upload only
+        query = build_filtered_shipment_query(None, use_all_data=False)
+        return jsonify(_cbp_analytics_payload(_shipment_analytics_totals(query)))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/chinapost-analytics', methods=['GET', 'POST'])
+@_etag_cached(_SHIPMENT_DATA_VERSION, _RECENT_UPLOAD_ID)
 def get_chinapost_analytics():
     """Get China Post-specific analytics from most recent upload only - BACKEND PROCESSED ONLY"""
     try:
         # Always use data from most recent upload only
-        most_recent_upload_id = FileUploadHistory.get_most_recent_upload_id()
-        
-        if most_recent_upload_id:
-            query = ProcessedShipment.query.filter(ProcessedShipment.file_upload_id == most_recent_upload_id)
-        else:
-            query = ProcessedShipment.query
-        
-        entries = query.all()
-        
-        if not entries:
-            return jsonify({
-                'total_weight': 0,
-                'total_declared_value': 0,
-                'total_records': 0,
-                'total_tariff': 0,
-                'unique_carriers': 0,
-                'unique_destinations': 0,
-                'unique_flights': 0,
-                'average_weight': 0,
-                'average_value': 0,
-                'currency_breakdown': {}
-            })
-        
-        # Calculate China Post analytics in backend
-        total_weight = 0
-        total_declared_value = 0
-        total_tariff = 0
-        carriers = set()
-        destinations = set()
-        flights = set()
-        currencies = {}
-        
-        for entry in entries:
-            # Weight calculation - handle all forms of invalid values
-            weight = 0
-            try:
-                if entry.bag_weight:
-                    val_str = str(entry.bag_weight).lower().strip()
-                    if val_str not in ['nan', 'null', 'none', '', 'n/a', 'na']:
-                        weight = float(entry.bag_weight)
-                        if not pd.isna(weight) and weight >= 0:
-                            total_weight += weight
-            except (ValueError, TypeError, AttributeError):
-                weight = 0
-            
-            # Declared value calculation - handle all forms of invalid values
-            declared_val = 0
-            try:
-                if entry.declared_value:
-                    val_str = str(entry.declared_value).lower().strip()
-                    if val_str not in ['nan', 'null', 'none', '', 'n/a', 'na']:
-                        declared_val = float(entry.declared_value)
-                        if not pd.isna(declared_val) and declared_val > 0:
-                            total_declared_value += declared_val
-            except (ValueError, TypeError, AttributeError):
-                declared_val = 0
-            
-            # Tariff calculation - handle 'nan' string values properly
-            try:
-                if entry.tariff_amount and str(entry.tariff_amount).lower() not in ['nan', 'null', 'none', '']:
-                    # Try to convert to float, skip if it's actually the string 'nan'
-                    if str(entry.tariff_amount).lower() != 'nan':
-                        tariff = float(entry.tariff_amount)
-                        total_tariff += tariff
-            except (ValueError, TypeError):
-                pass
-            
-            # Unique counts
-            if entry.flight_carrier_1:
-                carriers.add(entry.flight_carrier_1)
-            if entry.host_destination_station:
-                destinations.add(entry.host_destination_station)
-            if entry.flight_number_1:
-                flights.add(entry.flight_number_1)
-            
-            # Currency breakdown - filter out invalid currency values
-            if entry.currency:
-                curr_str = str(entry.currency).lower().strip()
-                if curr_str not in ['nan', 'null', 'none', '', 'n/a', 'na'] and len(curr_str) <= 10:
-                    currency = entry.currency
-                    if currency not in currencies:
-                        currencies[currency] = {'count': 0, 'totalValue': 0}
-                    currencies[currency]['count'] += 1
-                    if declared_val > 0:
-                        currencies[currency]['totalValue'] += declared_val
-        
-        return jsonify({
-            'total_weight': round(total_weight, 2),
-            'total_declared_value': round(total_declared_value, 2),
-            'total_records': len(entries),
-            'total_tariff': round(total_tariff, 2),
-            'unique_carriers': len(carriers),
-            'unique_destinations': len(destinations),
-            'unique_flights': len(flights),
-            'average_weight': round(total_weight / len(entries), 2) if len(entries) > 0 else 0,
-            'average_value': round(total_declared_value / len(entries), 2) if len(entries) > 0 else 0,
-            'currency_breakdown': currencies
-        })
+        query = build_filtered_shipment_query(None, use_all_data=False)
+        totals = _shipment_analytics_totals(query)
+        currencies = _shipment_currency_breakdown(query)
+        return jsonify(_chinapost_analytics_payload(totals, currencies))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1660,14 +1716,7 @@ def batch_recalculate_tariffs():
         
         # Date range filter
         if data.get('start_date') and data.get('end_date'):
-            query = query.filter(
-                and_(
-                    ProcessedShipment.arrival_date.isnot(None),
-                    ProcessedShipment.arrival_date != '',
-                    func.date(func.substr(ProcessedShipment.arrival_date, 1, 10)) >= data['start_date'],
-                    func.date(func.substr(ProcessedShipment.arrival_date, 1, 10)) <= data['end_date']
-                )
-            )
+            query = query.filter(_arrival_date_filter(data['start_date'], data['end_date']))
         
         # Route filter
         if data.get('routes'):
@@ -1684,8 +1733,19 @@ def batch_recalculate_tariffs():
             if route_filters:
                 query = query.filter(or_(*route_filters))
         
-        # Get shipments to recalculate
-        shipments = query.all()
+        # Get shipments to recalculate (plain column rows; the updates are written back in bulk below)
+        shipments = query.with_entities(
+            ProcessedShipment.id,
+            ProcessedShipment.host_origin_station,
+            ProcessedShipment.host_destination_station,
+            ProcessedShipment.declared_value,
+            ProcessedShipment.bag_weight,
+            ProcessedShipment.declared_content,
+            ProcessedShipment.goods_category,
+            ProcessedShipment.tracking_number,
+            ProcessedShipment.postal_service,
+            ProcessedShipment.arrival_date
+        ).order_by(ProcessedShipment.id).all()
         
         if not shipments:
             return jsonify({
@@ -1694,7 +1754,9 @@ def batch_recalculate_tariffs():
                 'updated_count': 0
             })
         
-        updated_count = 0
+        # Retroactively re-derive classification from raw data
+        processor = DataProcessor(IODA_DATA_FILE)
+        updates = []
         
         for shipment in shipments:
             try:
@@ -1704,9 +1766,6 @@ def batch_recalculate_tariffs():
                 declared_value = _safe_float(shipment.declared_value) or 0
                 bag_weight = _safe_float(shipment.bag_weight) or 0
                 
-                # Retroactively re-derive classification from raw data
-                processor = DataProcessor(IODA_DATA_FILE)
-                
                 # Re-derive goods category from declared content
                 if shipment.declared_content:
                     goods_category = processor._derive_goods_category(shipment.declared_content)
@@ -1718,8 +1777,8 @@ def batch_recalculate_tariffs():
                     # Create a mock row for postal service derivation
                     mock_row = {
                         'Tracking Number': shipment.tracking_number,
-                        'Sender Name': getattr(shipment, 'sender_name', ''),
-                        'Receiver Name': getattr(shipment, 'receiver_name', ''),
+                        'Sender Name': '',
+                        'Receiver Name': '',
                         'Content': shipment.declared_content or ''
                     }
                     postal_service = processor._derive_postal_service(mock_row)
@@ -1727,14 +1786,7 @@ def batch_recalculate_tariffs():
                     postal_service = shipment.postal_service or '*'
                 
                 # Parse ship date
-                ship_date = None
-                if shipment.arrival_date:
-                    try:
-                        ship_date = datetime.strptime(shipment.arrival_date[:10], '%Y-%m-%d').date()
-                    except:
-                        ship_date = date.today()
-                else:
-                    ship_date = date.today()
+                ship_date = _parse_iso_date((shipment.arrival_date or '')[:10], date.today())
                 
                 # Calculate new tariff using enhanced surcharge system
                 if declared_value > 0 and origin and destination:
@@ -1742,35 +1794,34 @@ def batch_recalculate_tariffs():
                         origin, destination, declared_value, goods_category, postal_service, ship_date, bag_weight
                     )
                     
-                    # Update shipment with new tariff calculation and classifications
-                    shipment.tariff_amount = round(tariff_result['tariff_amount'], 2)
-                    shipment.tariff_calculation_method = tariff_result['calculation_method']
-                    
-                    # Update retroactively derived classifications
-                    shipment.goods_category = goods_category
-                    shipment.postal_service = postal_service
-                    shipment.shipment_date = ship_date
-                    
-                    # Update rate information with category-only tracking
-                    if tariff_result.get('rate_used'):
-                        shipment.tariff_rate_used = tariff_result['rate_percentage']
-                        shipment.base_rate_id = tariff_result['rate_used'].id
-                    else:
-                        shipment.tariff_rate_used = 0.0
-                        shipment.base_rate_id = None
-                    
-                    # No surcharge in category-only system
-                    shipment.tariff_surcharge_used = 0.0
-                    shipment.surcharge_rate_id = None
-                    
-                    updated_count += 1
+                    # New tariff calculation, retroactively derived classifications and category-only rate
+                    # tracking (no surcharge in category-only system)
+                    rate_used = tariff_result.get('rate_used')
+                    updates.append({
+                        'id': shipment.id,
+                        'tariff_amount': round(tariff_result['tariff_amount'], 2),
+                        'tariff_calculation_method': tariff_result['calculation_method'],
+                        'goods_category': goods_category,
+                        'postal_service': postal_service,
+                        'shipment_date': ship_date,
+                        'tariff_rate_used': tariff_result['rate_percentage'] if rate_used else 0.0,
+                        'base_rate_id': rate_used.id if rate_used else None,
+                        'tariff_surcharge_used': 0.0,
+                        'surcharge_rate_id': None
+                    })
                 
             except Exception as e:
                 print(f"Error recalculating tariff for shipment {shipment.id}: {str(e)}")
                 continue
         
-        # Commit all updates
+        # Write the updates as executemany UPDATE ... WHERE id = ? batches instead of one flush per shipment,
+        # all in one transaction so a failure leaves no shipment half recalculated
+        for offset in range(0, len(updates), SHIPMENT_UPDATE_BATCH_SIZE):
+            db.session.execute(update(ProcessedShipment), updates[offset:offset + SHIPMENT_UPDATE_BATCH_SIZE])
+        
+        # Commit all updates (the shipment caches are expired once, after this commit)
         db.session.commit()
+        updated_count = len(updates)
         
         return jsonify({
             'success': True,
@@ -1784,7 +1835,8 @@ def batch_recalculate_tariffs():
         db.session.rollback()
         return jsonify({
             'success': False,
-            'error': f'Batch recalculation failed: {str(e)}'
+            'error': f'Batch recalculation failed: {str(e)}',
+            'message': 'Batch recalculation failed; no shipments were updated'
         }), 500
 
 @app.route('/classification-config', methods=['GET'])
@@ -2123,11 +2175,11 @@ def add_service_patterns(service):
 def get_inactive_rates():
     """Get all inactive tariff rates"""
     try:
-        inactive_rates = TariffRate.query.filter_by(is_active=False).all()
+        inactive_rates = TariffRate.query.filter_by(is_active=False).with_entities(*TariffRate.__table__.columns).all()
         
         return jsonify({
             'success': True,
-            'inactive_rates': [rate.to_dict() for rate in inactive_rates],
+            'inactive_rates': [TariffRate.row_to_dict(rate) for rate in inactive_rates],
             'count': len(inactive_rates)
         })
     except Exception as e:
@@ -2140,7 +2192,7 @@ def get_inactive_rates():
 def deactivate_rate(rate_id):
     """Deactivate a tariff rate"""
     try:
-        rate = TariffRate.query.get(rate_id)
+        rate = db.session.get(TariffRate, rate_id)
         if not rate:
             return jsonify({
                 'success': False,
@@ -2154,12 +2206,16 @@ def deactivate_rate(rate_id):
         rate.notes = f"{rate.notes or ''}\n[DEACTIVATED] {deactivation_reason}".strip()
         rate.updated_at = datetime.utcnow()
         
+        # Flush the targeted UPDATE and serialize before commit so the response
+        # doesn't trigger a second SELECT to refresh the expired row
+        db.session.flush()
+        rate_payload = rate.to_dict()
         db.session.commit()
         
         return jsonify({
             'success': True,
             'message': f'Tariff rate {rate_id} has been deactivated',
-            'rate': rate.to_dict()
+            'rate': rate_payload
         })
     except Exception as e:
         return jsonify({
@@ -2171,7 +2227,7 @@ def deactivate_rate(rate_id):
 def reactivate_rate(rate_id):
     """Reactivate a tariff rate"""
     try:
-        rate = TariffRate.query.get(rate_id)
+        rate = db.session.get(TariffRate, rate_id)
         if not rate:
             return jsonify({
                 'success': False,
@@ -2201,12 +2257,16 @@ def reactivate_rate(rate_id):
         rate.notes = f"{rate.notes or ''}\n[REACTIVATED] {reactivation_reason}".strip()
         rate.updated_at = datetime.utcnow()
         
+        # Flush the targeted UPDATE and serialize before commit so the response
+        # doesn't trigger a second SELECT to refresh the expired row
+        db.session.flush()
+        rate_payload = rate.to_dict()
         db.session.commit()
         
         return jsonify({
             'success': True,
             'message': f'Tariff rate {rate_id} has been reactivated',
-            'rate': rate.to_dict()
+            'rate': rate_payload
         })
     except Exception as e:
         return jsonify({
@@ -2282,6 +2342,8 @@ def bulk_deactivate_rates():
         }, synchronize_session=False)
         
         db.session.commit()
+        # Bulk query updates bypass ORM events, so expire cached rate lookups here
+        invalidate_route_rate_cache()
         
         return jsonify({
             'success': True,
@@ -2546,10 +2608,10 @@ def get_tariff_surcharges():
         surcharge_rates = TariffRate.query.filter(
             TariffRate.is_active == True,
             TariffRate.category_surcharge > 0
-        ).all()
+        ).with_entities(*TariffRate.__table__.columns).all()
         
         return jsonify({
-            'surcharge_rates': [rate.to_dict() for rate in surcharge_rates],
+            'surcharge_rates': [TariffRate.row_to_dict(rate) for rate in surcharge_rates],
             'total_surcharges': len(surcharge_rates)
         })
         
@@ -2563,10 +2625,10 @@ def get_tariff_base_rates():
         base_rates = TariffRate.query.filter(
             TariffRate.is_active == True,
             TariffRate.goods_category.in_(['*', 'All'])
-        ).all()
+        ).with_entities(*TariffRate.__table__.columns).all()
         
         return jsonify({
-            'base_rates': [rate.to_dict() for rate in base_rates],
+            'base_rates': [TariffRate.row_to_dict(rate) for rate in base_rates],
             'total_base_rates': len(base_rates)
         })
         
@@ -2581,7 +2643,7 @@ def get_surcharges_by_route():
         surcharge_rates = TariffRate.query.filter(
             TariffRate.is_active == True,
             TariffRate.category_surcharge > 0
-        ).all()
+        ).with_entities(*TariffRate.__table__.columns).all()
         
         routes = {}
         for rate in surcharge_rates:
@@ -2598,7 +2660,7 @@ def get_surcharges_by_route():
                 'postal_service': rate.postal_service,
                 'surcharge_percentage': round(rate.category_surcharge * 100, 2),
                 'surcharge_rate': rate.category_surcharge,
-                'rate_details': rate.to_dict()
+                'rate_details': TariffRate.row_to_dict(rate)
             })
         
         return jsonify({
@@ -2626,14 +2688,7 @@ def calculate_enhanced_tariff():
             return jsonify({'error': 'Valid origin, destination, and declared value are required'}), 400
         
         # Parse ship_date if provided
-        from datetime import datetime, date
-        if ship_date:
-            try:
-                ship_date = datetime.strptime(ship_date, '%Y-%m-%d').date()
-            except:
-                ship_date = date.today()
-        else:
-            ship_date = date.today()
+        ship_date = _parse_iso_date(ship_date, date.today())
         
         # Calculate using new category-based rate system
         result = TariffRate.calculate_tariff_for_shipment(
@@ -3016,7 +3071,6 @@ def delete_all_file_records(file_id):
 @app.route('/file-history/<int:file_id>/reprocess', methods=['POST'])
 def reprocess_file(file_id):
     """Reprocess a previously uploaded file from binary data"""
-    temp_path = None
     try:
         # Get the file history record
         upload_record = FileUploadHistory.query.get(file_id)
@@ -3030,15 +3084,8 @@ def reprocess_file(file_id):
         upload_record.mark_processing_started()
         
         try:
-            # Create temporary file from binary data for processing
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            temp_path = f"temp_reprocess_{timestamp}_{upload_record.id}.xlsx"
-            
-            with open(temp_path, 'wb') as f:
-                f.write(upload_record.original_file_data)
-            
-            # Read the original file
-            cnp_df = pd.read_excel(temp_path, sheet_name='Raw data provided by CNP', header=None)
+            # Read the original file straight from the stored binary data
+            cnp_df = pd.read_excel(io.BytesIO(upload_record.original_file_data), sheet_name='Raw data provided by CNP', header=None, engine=EXCEL_READ_ENGINE)
             
             # Check if IODA file exists
             if not os.path.exists(IODA_DATA_FILE):
@@ -3057,12 +3104,12 @@ def reprocess_file(file_id):
                 cbd_buffer = io.BytesIO()
                 
                 # Save CHINAPOST export to buffer
-                with pd.ExcelWriter(chinapost_buffer, engine='openpyxl') as writer:
+                with pd.ExcelWriter(chinapost_buffer, engine=EXCEL_WRITE_ENGINE) as writer:
                     chinapost_df.to_excel(writer, sheet_name='CHINAPOST Export', index=False)
                 chinapost_buffer.seek(0)
                 
                 # Save CBD export to buffer
-                with pd.ExcelWriter(cbd_buffer, engine='openpyxl') as writer:
+                with pd.ExcelWriter(cbd_buffer, engine=EXCEL_WRITE_ENGINE) as writer:
                     cbd_df.to_excel(writer, sheet_name='CBD Export', index=False)
                 cbd_buffer.seek(0)
                 
@@ -3105,10 +3152,6 @@ def reprocess_file(file_id):
         except Exception as processing_error:
             upload_record.mark_processing_failed(str(processing_error))
             raise processing_error
-        finally:
-            # Clean up temporary file
-            if temp_path and os.path.exists(temp_path):
-                os.remove(temp_path)
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -7,3 +7,12 @@ class Config:
     # Single database configuration - store in backend/data
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(base_dir, "data", "shipments.db")}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # Connection pool for the file-based SQLite engine (QueuePool): room for concurrent requests, and LIFO
+    # checkout so the most recently used, already warm connection is handed out first
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+        'pool_use_lifo': True
+    }
\ No newline at end of file
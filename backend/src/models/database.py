@@ -1,8 +1,35 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, case, and_, inspect
 from datetime import datetime
+from functools import lru_cache
+import time
+import sqlite3
 
 db = SQLAlchemy()
 
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Connection-level SQLite tuning, registered on the app's engine only: NORMAL sync when the database file is
+    already in WAL mode (utils/migrate_db.py switches it once), a memory-mapped file and a larger page cache
+    for repeated table scans. Nothing here changes the database file itself.
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        # NORMAL is only corruption-safe with WAL; rollback-journal databases keep the default FULL sync
+        if cursor.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+            cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA mmap_size=268435456')  # 256 MiB
+        cursor.execute('PRAGMA cache_size=-65536')  # 64 MiB
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
+
+# Lower-cased placeholder strings that stand in for missing values in imported data
+NULL_VALUE_TOKENS = frozenset({'nan', 'null', 'none', 'n/a', 'na'})
+
+# Route rate candidates are memoized per route and postal service; entries expire after the TTL or when any rate changes
+ROUTE_RATE_CACHE_TTL_SECONDS = 300
+_route_rate_cache_version = 0
+
 class TariffRate(db.Model):
     """Model for storing tariff rates between countries/stations with goods category, postal service, and date ranges"""
     __tablename__ = 'tariff_rates'
@@ -53,9 +80,10 @@ class TariffRate(db.Model):
         # Index for weight range queries
         db.Index('idx_weight_range_active', 'min_weight', 'max_weight', 'is_active'),
         
-        # Composite index for exact matching (used in upserts)
-        db.Index('idx_exact_match', 'origin_country', 'destination_country', 'goods_category', 
-                'postal_service', 'start_date', 'end_date', 'min_weight', 'max_weight'),
+        # Composite index for exact matching and overlap checks (used in upserts)
+        # is_active is included so the combined upsert lookup is answered from the index
+        db.Index('idx_exact_match_active', 'origin_country', 'destination_country', 'goods_category', 
+                'postal_service', 'start_date', 'end_date', 'min_weight', 'max_weight', 'is_active'),
         
         # Index for active rates lookup
         db.Index('idx_active_rates', 'is_active', 'origin_country', 'destination_country'),
@@ -69,8 +97,10 @@ class TariffRate(db.Model):
     @classmethod
     def check_overlapping_rates(cls, origin_country, destination_country, goods_category, 
                                postal_service, start_date, end_date, exclude_id=None):
-        """Check for overlapping rate periods for the same route/category/service"""
-        query = cls.query.filter(
+        """Check for overlapping rate periods for the same route/category/service (lightweight rows, not ORM objects)"""
+        query = cls.query.with_entities(
+            cls.id, cls.start_date, cls.end_date, cls.tariff_rate
+        ).filter(
             cls.origin_country == origin_country,
             cls.destination_country == destination_country,
             cls.goods_category == goods_category,
@@ -116,8 +146,14 @@ class TariffRate(db.Model):
     @classmethod
     def check_combined_conflicts(cls, origin_country, destination_country, goods_category, 
                                postal_service, start_date, end_date, min_weight, max_weight, exclude_id=None):
-        """Optimized single query to check for all conflicts (date + weight range overlap)"""
-        query = cls.query.filter(
+        """
+        Optimized single query to check for all conflicts (date + weight range overlap).
+        Returns lightweight rows with only the fields conflict responses report.
+        """
+        query = cls.query.with_entities(
+            cls.id, cls.start_date, cls.end_date,
+            cls.min_weight, cls.max_weight, cls.tariff_rate
+        ).filter(
             cls.origin_country == origin_country,
             cls.destination_country == destination_country,
             cls.goods_category == goods_category,
@@ -136,6 +172,35 @@ class TariffRate(db.Model):
             
         return query.all()
     
+    @classmethod
+    def find_exact_match_or_conflicts(cls, origin_country, destination_country, goods_category, 
+                                      postal_service, start_date, end_date, min_weight, max_weight):
+        """
+        Single query for upserts: look up the exact match and the overlapping active rates together.
+        An exact match (same route/category/service/dates/weights) always lies inside the overlap
+        window, so one range scan on idx_exact_match_active returns both.
+        Returns: (exact_match or None, list of conflicting active rates if there is no exact match)
+        """
+        candidates = cls.query.filter(
+            cls.origin_country == origin_country,
+            cls.destination_country == destination_country,
+            cls.goods_category == goods_category,
+            cls.postal_service == postal_service,
+            # Check for date overlap
+            cls.start_date <= end_date,
+            cls.end_date >= start_date,
+            # Check for weight range overlap
+            cls.min_weight <= max_weight,
+            cls.max_weight >= min_weight
+        ).all()
+        
+        for rate in candidates:
+            if (rate.start_date == start_date and rate.end_date == end_date and
+                rate.min_weight == min_weight and rate.max_weight == max_weight):
+                return rate, []
+        
+        return None, [rate for rate in candidates if rate.is_active]
+    
     @classmethod
     def bulk_check_conflicts(cls, rate_definitions, exclude_ids=None):
         """
@@ -212,26 +277,31 @@ class TariffRate(db.Model):
     
     def to_dict(self):
         """Convert to dictionary for API responses"""
+        return TariffRate.row_to_dict(self)
+
+    @staticmethod
+    def row_to_dict(row):
+        """to_dict for any object exposing the tariff rate columns as attributes, e.g. a column-only query Row"""
         return {
-            'id': self.id,
-            'created_at': self.created_at.isoformat() if self.created_at else '',
-            'updated_at': self.updated_at.isoformat() if self.updated_at else '',
-            'origin_country': self.origin_country,
-            'destination_country': self.destination_country,
-            'goods_category': self.goods_category,
-            'postal_service': self.postal_service,
-            'start_date': self.start_date.isoformat() if self.start_date else '',
-            'end_date': self.end_date.isoformat() if self.end_date else '',
-            'min_weight': self.min_weight,
-            'max_weight': self.max_weight,
-            'tariff_rate': self.tariff_rate,
-            'category_surcharge': self.category_surcharge,
-            'minimum_tariff': self.minimum_tariff,
-            'maximum_tariff': self.maximum_tariff,
-            'currency': self.currency,
-            'is_active': self.is_active,
-            'notes': self.notes or '',
-            'category_rates': self.category_rates or {}
+            'id': row.id,
+            'created_at': row.created_at.isoformat() if row.created_at else '',
+            'updated_at': row.updated_at.isoformat() if row.updated_at else '',
+            'origin_country': row.origin_country,
+            'destination_country': row.destination_country,
+            'goods_category': row.goods_category,
+            'postal_service': row.postal_service,
+            'start_date': row.start_date.isoformat() if row.start_date else '',
+            'end_date': row.end_date.isoformat() if row.end_date else '',
+            'min_weight': row.min_weight,
+            'max_weight': row.max_weight,
+            'tariff_rate': row.tariff_rate,
+            'category_surcharge': row.category_surcharge,
+            'minimum_tariff': row.minimum_tariff,
+            'maximum_tariff': row.maximum_tariff,
+            'currency': row.currency,
+            'is_active': row.is_active,
+            'notes': row.notes or '',
+            'category_rates': row.category_rates or {}
         }
     
     def calculate_tariff(self, declared_value):
@@ -296,35 +366,58 @@ class TariffRate(db.Model):
         if postal_service is None:
             postal_service = '*'
         
-        # Look for route-based rates that may contain multiple categories
+        # Look for route-based rates that may contain multiple categories (postal service filtered in SQL)
         route_query = TariffRate.query.filter(
             TariffRate.origin_country == origin,
             TariffRate.destination_country == destination,
             TariffRate.is_active == True,
             TariffRate.start_date <= ship_date,
-            TariffRate.end_date >= ship_date
+            TariffRate.end_date >= ship_date,
+            TariffRate.postal_service.in_((postal_service, '*'))
         )
         
-        # Filter by postal service
-        route_rates = [r for r in route_query.all() 
-                      if r.postal_service in (postal_service, '*')]
-        
-        # Filter by weight if provided
-        if weight is not None and route_rates:
-            weight_matches = [r for r in route_rates 
-                            if r.min_weight <= weight <= r.max_weight]
-            if weight_matches:
-                route_rates = weight_matches
-        
-        if route_rates:
-            # Sort by specificity (most specific postal service first)
-            def specificity_score(rate):
-                return 1 if rate.postal_service != '*' else 0
-            
-            route_rates.sort(key=specificity_score, reverse=True)
-            return route_rates[0]
+        # Best match first: rates covering the weight (if provided), then by specificity
+        # (most specific postal service first), then oldest rate
+        ordering = []
+        if weight is not None:
+            ordering.append(case((and_(TariffRate.min_weight <= weight, TariffRate.max_weight >= weight), 1), else_=0).desc())
+        ordering.append(case((TariffRate.postal_service != '*', 1), else_=0).desc())
         
-        return None
+        return route_query.order_by(*ordering, TariffRate.id).first()
+    
+    @staticmethod
+    def find_route_rate_cached(origin, destination, postal_service=None, ship_date=None, weight=None):
+        """
+        Same as find_route_rate, but the route's active rates are memoized per (origin, destination, postal_service)
+        and the date/weight match is picked in Python, so shipments with different weights and dates share one
+        cache entry instead of each missing the cache
+        """
+        from datetime import date
+        
+        if ship_date is None:
+            ship_date = date.today()
+        if postal_service is None:
+            postal_service = '*'
+        
+        candidates = _cached_route_rate_candidates(
+            origin, destination, postal_service,
+            _route_rate_cache_version, int(time.monotonic() // ROUTE_RATE_CACHE_TTL_SECONDS)
+        )
+        
+        # Same ranking as find_route_rate: rates covering the weight first, then the specific postal service,
+        # then the oldest rate (candidates are in id order, so only a strictly better rank replaces the best)
+        rate_id, best_rank = None, None
+        for candidate_id, start_date, end_date, min_weight, max_weight, candidate_service in candidates:
+            if not (start_date <= ship_date <= end_date):
+                continue
+            covers_weight = (weight is not None and min_weight is not None and max_weight is not None and
+                             min_weight <= weight <= max_weight)
+            rank = (covers_weight, candidate_service != '*')
+            if best_rank is None or rank > best_rank:
+                rate_id, best_rank = candidate_id, rank
+        
+        # Identity map hit when the rate is already loaded in this session
+        return db.session.get(TariffRate, rate_id) if rate_id is not None else None
     
     @staticmethod
     def calculate_tariff_for_shipment(origin, destination, declared_value, 
@@ -351,8 +444,8 @@ class TariffRate(db.Model):
         if ship_date is None:
             ship_date = date.today()
         
-        # Find the route rate record
-        route_rate = TariffRate.find_route_rate(origin, destination, postal_service, ship_date, weight)
+        # Find the route rate record (cached lookup)
+        route_rate = TariffRate.find_route_rate_cached(origin, destination, postal_service, ship_date, weight)
         
         if route_rate:
             # Get the specific category rate from the route record
@@ -384,6 +477,29 @@ class TariffRate(db.Model):
                 'error': f'No tariff rate found for route from {origin} to {destination}'
             }
 
+@lru_cache(maxsize=1024)
+def _cached_route_rate_candidates(origin, destination, postal_service, cache_version, ttl_bucket):
+    """Memoized active rates for one route and postal service (or '*'), as plain tuples in id order"""
+    return tuple(tuple(row) for row in db.session.query(
+        TariffRate.id, TariffRate.start_date, TariffRate.end_date,
+        TariffRate.min_weight, TariffRate.max_weight, TariffRate.postal_service
+    ).filter(
+        TariffRate.origin_country == origin,
+        TariffRate.destination_country == destination,
+        TariffRate.is_active == True,
+        TariffRate.postal_service.in_((postal_service, '*'))
+    ).order_by(TariffRate.id))
+
+def invalidate_route_rate_cache(*args):
+    """Expire all memoized route rate lookups (called whenever a tariff rate is written)"""
+    global _route_rate_cache_version
+    _route_rate_cache_version += 1
+
+# ORM inserts/updates/deletes of rates expire the lookup cache; bulk query.update() callers invalidate explicitly
+event.listen(TariffRate, 'after_insert', invalidate_route_rate_cache)
+event.listen(TariffRate, 'after_update', invalidate_route_rate_cache)
+event.listen(TariffRate, 'after_delete', invalidate_route_rate_cache)
+
 class ProcessedShipment(db.Model):
     """Model for storing processed CHINAPOST export data (the complete workflow output)"""
     __tablename__ = 'processed_shipments'
@@ -394,6 +510,12 @@ class ProcessedShipment(db.Model):
             'pawb',
             name='uix_shipment_unique'
         ),
+        # Index for date range filters (with destination for breakdown queries)
+        db.Index('idx_shipment_arrival_destination', 'arrival_date_parsed', 'host_destination_station'),
+        # Indexes for route/destination/carrier group-bys (tariff routes, stations, dashboard breakdowns)
+        db.Index('idx_shipment_route', 'host_origin_station', 'host_destination_station'),
+        db.Index('idx_shipment_destination', 'host_destination_station'),
+        db.Index('idx_shipment_carrier', 'flight_carrier_1'),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -426,6 +548,7 @@ class ProcessedShipment(db.Model):
     
     # Arrival and ULD information
     arrival_date = db.Column(db.String(50))  # Arrival Date
+    arrival_date_parsed = db.Column(db.Date)  # Arrival Date parsed at ingest (indexed for date filters)
     arrival_uld_number = db.Column(db.String(100))  # Arrival ULD number
     
     # Package and content details
@@ -457,70 +580,87 @@ class ProcessedShipment(db.Model):
     arrival_date_formatted = db.Column(db.String(50))  # Formatted date for CBD
     declared_value_usd = db.Column(db.String(50))  # USD formatted value for CBD
 
-    def _clean_value(self, value):
+    @staticmethod
+    def _clean_value(value):
         """Clean value to remove NaN/null strings"""
         if value is None:
             return ''
         val_str = str(value).lower().strip()
-        if val_str in ['nan', 'null', 'none', 'n/a', 'na']:
+        if val_str in NULL_VALUE_TOKENS:
             return ''
         return str(value)
 
+    @staticmethod
+    def _clean_number(value):
+        """Numeric column value for API responses: NULL becomes 0.0, legacy NaN/null text becomes ''"""
+        if value is None:
+            return 0.0
+        if isinstance(value, str) and value.lower().strip() in NULL_VALUE_TOKENS:
+            return ''
+        return value
+
     def to_dict(self):
         """Convert entry to dictionary for API responses with clean values"""
+        return ProcessedShipment.row_to_dict(self)
+
+    @staticmethod
+    def row_to_dict(row):
+        """to_dict for any object exposing the shipment columns as attributes, e.g. a column-only query Row"""
+        clean_value = ProcessedShipment._clean_value
+        clean_number = ProcessedShipment._clean_number
         return {
-            'id': self.id,
-            'created_at': self.created_at.isoformat() if self.created_at else '',
-            'file_upload_id': self.file_upload_id,
+            'id': row.id,
+            'created_at': row.created_at.isoformat() if row.created_at else '',
+            'file_upload_id': row.file_upload_id,
             
             # Core identification
-            'sequence_number': self._clean_value(self.sequence_number),
-            'pawb': self._clean_value(self.pawb),
-            'cardit': self._clean_value(self.cardit),
-            'tracking_number': self._clean_value(self.tracking_number),
-            'receptacle_id': self._clean_value(self.receptacle_id),
+            'sequence_number': clean_value(row.sequence_number),
+            'pawb': clean_value(row.pawb),
+            'cardit': clean_value(row.cardit),
+            'tracking_number': clean_value(row.tracking_number),
+            'receptacle_id': clean_value(row.receptacle_id),
             
             # Flight and routing
-            'host_origin_station': self._clean_value(self.host_origin_station),
-            'host_destination_station': self._clean_value(self.host_destination_station),
-            'flight_carrier_1': self._clean_value(self.flight_carrier_1),
-            'flight_number_1': self._clean_value(self.flight_number_1),
-            'flight_date_1': self._clean_value(self.flight_date_1),
-            'flight_carrier_2': self._clean_value(self.flight_carrier_2),
-            'flight_number_2': self._clean_value(self.flight_number_2),
-            'flight_date_2': self._clean_value(self.flight_date_2),
-            'flight_carrier_3': self._clean_value(self.flight_carrier_3),
-            'flight_number_3': self._clean_value(self.flight_number_3),
-            'flight_date_3': self._clean_value(self.flight_date_3),
+            'host_origin_station': clean_value(row.host_origin_station),
+            'host_destination_station': clean_value(row.host_destination_station),
+            'flight_carrier_1': clean_value(row.flight_carrier_1),
+            'flight_number_1': clean_value(row.flight_number_1),
+            'flight_date_1': clean_value(row.flight_date_1),
+            'flight_carrier_2': clean_value(row.flight_carrier_2),
+            'flight_number_2': clean_value(row.flight_number_2),
+            'flight_date_2': clean_value(row.flight_date_2),
+            'flight_carrier_3': clean_value(row.flight_carrier_3),
+            'flight_number_3': clean_value(row.flight_number_3),
+            'flight_date_3': clean_value(row.flight_date_3),
             
             # Arrival and ULD
-            'arrival_date': self._clean_value(self.arrival_date),
-            'arrival_uld_number': self._clean_value(self.arrival_uld_number),
+            'arrival_date': clean_value(row.arrival_date),
+            'arrival_uld_number': clean_value(row.arrival_uld_number),
             
             # Package details
-            'bag_weight': self.bag_weight if self.bag_weight is not None else 0.0,
-            'bag_number': self._clean_value(self.bag_number),
-            'declared_content': self._clean_value(self.declared_content),
-            'hs_code': self._clean_value(self.hs_code),
-            'declared_value': self.declared_value if self.declared_value is not None else 0.0,
-            'currency': self._clean_value(self.currency),
-            'number_of_packets': self.number_of_packets if self.number_of_packets is not None else 0,
-            'tariff_amount': self.tariff_amount if self.tariff_amount is not None else 0.0,
-            'goods_category': self._clean_value(self.goods_category),
-            'postal_service': self._clean_value(self.postal_service),
-            'shipment_date': self.shipment_date.isoformat() if self.shipment_date else '',
-            'tariff_rate_used': self.tariff_rate_used,
-            'tariff_surcharge_used': self.tariff_surcharge_used or 0.0,
-            'base_rate_id': self.base_rate_id,
-            'surcharge_rate_id': self.surcharge_rate_id,
-            'tariff_calculation_method': self._clean_value(self.tariff_calculation_method),
+            'bag_weight': clean_number(row.bag_weight),
+            'bag_number': clean_value(row.bag_number),
+            'declared_content': clean_value(row.declared_content),
+            'hs_code': clean_value(row.hs_code),
+            'declared_value': clean_number(row.declared_value),
+            'currency': clean_value(row.currency),
+            'number_of_packets': row.number_of_packets if row.number_of_packets is not None else 0,
+            'tariff_amount': clean_number(row.tariff_amount),
+            'goods_category': clean_value(row.goods_category),
+            'postal_service': clean_value(row.postal_service),
+            'shipment_date': row.shipment_date.isoformat() if row.shipment_date else '',
+            'tariff_rate_used': row.tariff_rate_used,
+            'tariff_surcharge_used': row.tariff_surcharge_used or 0.0,
+            'base_rate_id': row.base_rate_id,
+            'surcharge_rate_id': row.surcharge_rate_id,
+            'tariff_calculation_method': clean_value(row.tariff_calculation_method),
             
             # CBD export fields
-            'carrier_code': self._clean_value(self.carrier_code),
-            'flight_trip_number': self._clean_value(self.flight_trip_number),
-            'arrival_port_code': self._clean_value(self.arrival_port_code),
-            'arrival_date_formatted': self._clean_value(self.arrival_date_formatted),
-            'declared_value_usd': self._clean_value(self.declared_value_usd)
+            'carrier_code': clean_value(row.carrier_code),
+            'flight_trip_number': clean_value(row.flight_trip_number),
+            'arrival_port_code': clean_value(row.arrival_port_code),
+            'arrival_date_formatted': clean_value(row.arrival_date_formatted),
+            'declared_value_usd': clean_value(row.declared_value_usd)
         }
     
     def to_chinapost_format(self):
@@ -788,4 +928,31 @@ class SystemConfig(db.Model):
             else:
                 return config.config_value
         except (ValueError, TypeError):
-            return default
\ No newline at end of file
+            return default
+
+def upgrade_legacy_schema():
+    """
+    Bring a database created by an older version up to the current models. db.create_all() only creates
+    missing tables, so existing ones get the parsed arrival date column (backfilled from arrival_date) and any
+    missing model indexes here; an up-to-date database is left untouched.
+    """
+    inspector = inspect(db.engine)
+    shipment_columns = {column['name'] for column in inspector.get_columns(ProcessedShipment.__tablename__)}
+    
+    with db.engine.begin() as conn:
+        if 'arrival_date_parsed' not in shipment_columns:
+            conn.exec_driver_sql('ALTER TABLE processed_shipments ADD COLUMN arrival_date_parsed DATE')
+            # Same conversion the date filter used to apply per row at query time
+            conn.exec_driver_sql(
+                "UPDATE processed_shipments SET arrival_date_parsed = date(substr(arrival_date, 1, 10)) "
+                "WHERE arrival_date IS NOT NULL AND arrival_date != ''"
+            )
+        
+        for table in (TariffRate.__table__, ProcessedShipment.__table__):
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            # idx_exact_match was superseded by idx_exact_match_active (with is_active)
+            if 'idx_exact_match' in existing_indexes:
+                conn.exec_driver_sql('DROP INDEX idx_exact_match')
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
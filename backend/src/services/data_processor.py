@@ -10,6 +10,29 @@ import os
 import re
 from typing import Dict, Any, Tuple, Optional
 from datetime import datetime, date
+from functools import lru_cache
+from importlib.util import find_spec
+
+# Parse .xlsx with the Rust calamine reader when python-calamine is installed (much faster, lower peak
+# memory); otherwise openpyxl, which pandas already opens in read-only mode
+EXCEL_READ_ENGINE = 'calamine' if find_spec('python_calamine') else 'openpyxl'
+# Write .xlsx with xlsxwriter when installed (streams rows, several times faster than openpyxl)
+EXCEL_WRITE_ENGINE = 'xlsxwriter' if find_spec('xlsxwriter') else 'openpyxl'
+
+# Trailing leg number of a 'Flight Carrier N' / 'Flight Number N' column
+LEG_NUMBER_PATTERN = re.compile(r'\d+$')
+
+# IODA leg timestamp columns that neither export uses; they are skipped while the workbook is parsed
+IODA_SKIPPED_COLUMN_PREFIXES = ('actual_depart_datetime', 'actual_arrive_datetime')
+
+
+@lru_cache(maxsize=2)
+def _read_ioda_workbook(file_path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    """Parsed IODA workbook, memoized per file version - mtime_ns and size only key out replaced files"""
+    return pd.read_excel(
+        file_path, engine=EXCEL_READ_ENGINE,
+        usecols=lambda col: not str(col).startswith(IODA_SKIPPED_COLUMN_PREFIXES)
+    )
 
 
 class DataProcessor:
@@ -51,7 +74,11 @@ class DataProcessor:
                 print("Please ensure the IODA data file exists in the correct location.")
                 return False
                 
-            self.master_cardit_inner_event_df = pd.read_excel(self.ioda_file_path)
+            # The reference file rarely changes, so reuse the parsed workbook until it is modified
+            file_stat = os.stat(self.ioda_file_path)
+            self.master_cardit_inner_event_df = _read_ioda_workbook(
+                self.ioda_file_path, file_stat.st_mtime_ns, file_stat.st_size
+            ).copy()
             print(f"Successfully loaded IODA data: {self.master_cardit_inner_event_df.shape}")
             print(f"IODA columns: {self.master_cardit_inner_event_df.columns.tolist()}")
             
@@ -88,8 +115,8 @@ class DataProcessor:
             # Set row 4 (0-indexed) as the column headers
             cnp_df.columns = cnp_df.iloc[4]
             
-            # Drop rows 0 to 5 (inclusive) and reset index
-            cnp_df = cnp_df.drop(index=range(0, 6)).reset_index(drop=True)
+            # Drop rows 0 to 5 (inclusive) and reset index - positional slice, so no drop-by-label copy first
+            cnp_df = cnp_df.iloc[6:].reset_index(drop=True)
             
             # Remove empty rows
             cnp_df = cnp_df.dropna(how='all')
@@ -166,9 +193,9 @@ class DataProcessor:
             print(f"Merged data shape: {cx_inner_cnp_df.shape}")
             
             # Add required columns for CHINAPOST export
-            # Number of Packets under same receptacle
-            cx_inner_cnp_df['Number of Packet under same receptacle'] = (
-                cx_inner_cnp_df.groupby('Receptacle')['Receptacle'].transform('count')
+            # Number of Packets under same receptacle (one hash count, mapped back onto the rows)
+            cx_inner_cnp_df['Number of Packet under same receptacle'] = cx_inner_cnp_df['Receptacle'].map(
+                cx_inner_cnp_df['Receptacle'].value_counts()
             )
             
             # Enhanced tariff calculation using configured rates
@@ -278,39 +305,38 @@ class DataProcessor:
                 self.port_code_mapping
             ).fillna(0).astype(int)
             
-            # Identify all flight leg numbers from column names
-            flight_leg_nums = sorted(set(
-                int(re.search(r'\d+$', col).group())
+            # Identify all flight leg numbers from column names (one search per flight column)
+            leg_matches = (
+                LEG_NUMBER_PATTERN.search(col)
                 for col in df.columns
-                if re.search(r'\d+$', col) and (
-                    col.startswith('Flight Carrier') or col.startswith('Flight Number')
-                )
-            ))
-            
-            # Function to get the highest available flight leg per row
-            def get_highest_leg_value(row, prefix):
-                for leg in reversed(flight_leg_nums):
+                if col.startswith(('Flight Carrier', 'Flight Number'))
+            )
+            flight_leg_nums = sorted({int(match.group()) for match in leg_matches if match})
+            
+            # Value from the highest available flight leg per row: each leg's column is laid over the
+            # previous legs wherever it is populated (column-wise, instead of a per-row apply)
+            def get_highest_leg_values(prefix):
+                values = np.full(len(df), None, dtype=object)
+                for leg in flight_leg_nums:
                     col_name = f"{prefix} {leg}"
-                    if col_name in row and pd.notnull(row[col_name]):
-                        return row[col_name]
-                return None
+                    if col_name in df.columns:
+                        populated = df[col_name].notna().to_numpy()
+                        values[populated] = df[col_name].to_numpy(dtype=object)[populated]
+                return pd.Series(values.tolist(), index=df.index)
             
-            # Apply function to get Carrier Code and Flight Number
-            df['Carrier Code'] = df.apply(
-                lambda row: get_highest_leg_value(row, 'Flight Carrier'), axis=1
-            )
-            df['Flight/Trip Number'] = df.apply(
-                lambda row: get_highest_leg_value(row, 'Flight Number'), axis=1
-            )
+            # Get Carrier Code and Flight Number
+            df['Carrier Code'] = get_highest_leg_values('Flight Carrier')
+            df['Flight/Trip Number'] = get_highest_leg_values('Flight Number')
             
             # Format Arrival Date and Declared Value
             df['Arrival Date'] = pd.to_datetime(
                 df['Arrival Date'], errors='coerce'
             ).dt.strftime('%d/%m/%Y')
             
-            df['Declared Value (USD)'] = df['Declared Value'].apply(
-                lambda x: f"${x:.2f}" if pd.notnull(x) else ""
-            )
+            declared_value = df['Declared Value']
+            df['Declared Value (USD)'] = pd.Series(
+                np.char.mod('$%.2f', declared_value.to_numpy(dtype=float)), index=df.index, dtype=object
+            ).where(declared_value.notna(), '')
             
             # Create the final CBD export dataframe
             cbd_df = df[[
@@ -378,9 +404,12 @@ class DataProcessor:
             print("Calculating tariffs using enhanced tariff system...")
             
             # Import here to avoid circular imports
-            from models.database import TariffRate
+            from models.database import TariffRate, SystemConfig
             from datetime import datetime, date
             
+            # Rate reported for shipments without a configured rate (one lookup for the whole batch)
+            fallback_rate = SystemConfig.get_fallback_rate()
+            
             results = {
                 'tariff_amounts': [],
                 'categories': [],
@@ -390,7 +419,11 @@ class DataProcessor:
                 'shipment_dates': []
             }
             
-            for _, row in merged_df.iterrows():
+            # Plain dict per row (same .get access as a Series) instead of building a Series with iterrows
+            columns = merged_df.columns.tolist()
+            for values in merged_df.itertuples(index=False, name=None):
+                row = dict(zip(columns, values))
+                
                 # Extract shipment details
                 origin = row.get('Host Origin Station', '')
                 destination = row.get('Host Destination Station', '')
@@ -426,9 +459,6 @@ class DataProcessor:
                     results['tariff_amounts'].append(round(tariff_result['tariff_amount'], 2))
                     results['categories'].append(category)
                     results['services'].append(service)
-                    # Import here to avoid circular imports
-                    from models.database import SystemConfig
-                    fallback_rate = SystemConfig.get_fallback_rate()
                     results['rates_used'].append(
                         tariff_result['rate_used'].tariff_rate if tariff_result['rate_used'] else fallback_rate
                     )
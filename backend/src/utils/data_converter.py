@@ -5,6 +5,13 @@ from datetime import datetime, date
 import re
 from typing import Optional, Union
 
+import pandas as pd
+
+# Placeholder strings treated as missing values (compared after strip/lower)
+NULL_TOKENS = frozenset({'nan', 'null', 'none', 'n/a', 'na'})
+NUMERIC_NULL_TOKENS = NULL_TOKENS | {'', '-'}
+DATE_NULL_TOKENS = frozenset({'', 'nan', 'null', 'None', 'N/A'})  # compared case-sensitively
+
 
 def parse_date_flexible(date_str: str) -> Optional[date]:
     """
@@ -16,7 +23,7 @@ def parse_date_flexible(date_str: str) -> Optional[date]:
     Returns:
         date: Parsed date or None if parsing fails
     """
-    if not date_str or str(date_str).strip() in ['', 'nan', 'null', 'None', 'N/A']:
+    if not date_str or str(date_str).strip() in DATE_NULL_TOKENS:
         return None
     
     date_str = str(date_str).strip()
@@ -83,7 +90,7 @@ def safe_float_conversion(value: Union[str, int, float]) -> Optional[float]:
     value_str = str(value).strip().lower()
     
     # Handle empty or null-like values
-    if value_str in ['', 'nan', 'null', 'none', 'n/a', 'na', '-']:
+    if value_str in NUMERIC_NULL_TOKENS:
         return None
     
     # Remove common currency symbols and separators
@@ -104,6 +111,27 @@ def safe_float_conversion(value: Union[str, int, float]) -> Optional[float]:
     return None
 
 
+def safe_float_series(series: pd.Series) -> pd.Series:
+    """
+    Vectorized safe_float_conversion for a whole column
+    
+    pd.to_numeric parses plain numbers in one pass; only the values it rejects
+    (currency symbols, "123.45 USD", placeholder strings) go through
+    safe_float_conversion individually.
+    
+    Args:
+        series: Column of raw values
+        
+    Returns:
+        pd.Series: Object series of floats, with None for missing/invalid values
+    """
+    numeric = pd.to_numeric(series, errors='coerce').astype(object)
+    unparsed = numeric.isna() & series.notna()
+    if unparsed.any():
+        numeric[unparsed] = series[unparsed].map(safe_float_conversion)
+    return numeric.where(numeric.notna(), None)
+
+
 def safe_int_conversion(value: Union[str, int, float]) -> Optional[int]:
     """
     Safely convert value to integer with better error handling
@@ -129,7 +157,7 @@ def safe_int_conversion(value: Union[str, int, float]) -> Optional[int]:
     value_str = str(value).strip().lower()
     
     # Handle empty or null-like values
-    if value_str in ['', 'nan', 'null', 'none', 'n/a', 'na', '-']:
+    if value_str in NUMERIC_NULL_TOKENS:
         return None
     
     try:
@@ -163,7 +191,7 @@ def clean_string_field(value: Union[str, int, float]) -> str:
     value_str = str(value).strip()
     
     # Handle null-like values
-    if value_str.lower() in ['nan', 'null', 'none', 'n/a', 'na']:
+    if value_str.lower() in NULL_TOKENS:
         return ''
     
     return value_str
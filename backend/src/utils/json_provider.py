@@ -0,0 +1,62 @@
+"""
+Flask JSON provider backed by orjson for faster API response encoding
+"""
+import math
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Encode responses with orjson when it is installed.
+
+    Output matches Flask's default provider: keys stay sorted and dates are
+    still passed through Flask's default handler (HTTP date format). Anything
+    orjson rejects (e.g. integers wider than 64 bits) is encoded by the
+    standard library instead.
+
+    One deliberate difference: non-finite floats (NaN, Infinity) are encoded
+    as null. The standard library emits bare NaN/Infinity tokens, which are
+    not valid JSON and make the browser's JSON.parse reject the whole
+    response; the fallback path normalizes them the same way so both paths agree.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or 'cls' in kwargs:
+            return super().dumps(obj, **kwargs)
+
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+        except TypeError:
+            return super().dumps(_replace_non_finite(obj), **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # The standard library also accepts NaN/Infinity tokens in request bodies (and raises for real errors)
+            return super().loads(s)
+
+
+def _replace_non_finite(obj):
+    """Copy of obj with NaN/Infinity floats inside dicts, lists and tuples replaced by None (as orjson encodes them)"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _replace_non_finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_replace_non_finite(value) for value in obj]
+    return obj
@@ -11,7 +11,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import app
-from models.database import db, TariffRate, ProcessedShipment
+from models.database import db, TariffRate, ProcessedShipment, upgrade_legacy_schema
 from datetime import date
 
 def migrate_database():
@@ -23,6 +23,9 @@ def migrate_database():
             # This will create new tables with the enhanced schema
             db.create_all()
             
+            # Columns and indexes added to existing tables since they were created
+            upgrade_legacy_schema()
+            
             print("Database migration completed successfully!")
             
             # Update existing records to have default values for new fields
@@ -50,6 +53,13 @@ def migrate_database():
             print(f"Updated {updated_rates} tariff rate records")
             print(f"Updated {updated_shipments} shipment records")
             
+            # Switch SQLite databases to WAL journaling once; the mode is stored in the database file, so the
+            # app's connections pick it up (and relax to synchronous=NORMAL) from then on
+            if db.engine.dialect.name == 'sqlite':
+                with db.engine.connect() as conn:
+                    journal_mode = conn.exec_driver_sql('PRAGMA journal_mode=WAL').scalar()
+                print(f"SQLite journal mode: {journal_mode}")
+            
             # Display current state
             total_rates = TariffRate.query.count()
             total_shipments = ProcessedShipment.query.count()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import {
   Download,
   Eye,
@@ -8,20 +8,20 @@ import {
   Plane,
   MapPin,
 } from 'lucide-react';
-import { apiService } from '../../services/api';
 import { formatDate } from '../../utils/displayHelpers';
 
 interface CBPSectionProps {
   data: any[];
   onDownload: () => void;
   isAvailable: boolean;
+  // Backend CBP analytics for the most recent upload, fetched once by the parent page
+  analytics: any;
 }
 
-const CBPSection: React.FC<CBPSectionProps> = ({ data, onDownload, isAvailable }) => {
+const CBPSection: React.FC<CBPSectionProps> = ({ data, onDownload, isAvailable, analytics }) => {
   const [searchTerm, setSearchTerm] = useState('');
   const [selectedCarrier, setSelectedCarrier] = useState('');
   const [currentPage, setCurrentPage] = useState(1);
-  const [analytics, setAnalytics] = useState<any>(null);
   const itemsPerPage = 10;
 
   // Use backend-provided data - NO FRONTEND PROCESSING
@@ -40,31 +40,6 @@ const CBPSection: React.FC<CBPSectionProps> = ({ data, onDownload, isAvailable }
     content: item.declared_content || '',
   }));
 
-  // Fetch analytics from backend for most recent upload only - NO FRONTEND CALCULATIONS
-  useEffect(() => {
-    const fetchAnalytics = async () => {
-      try {
-        // Get analytics for the most recent upload only (no date filtering)
-        const analyticsData = await apiService.getCBPAnalytics();
-        setAnalytics(analyticsData);
-      } catch (error) {
-        console.error('Error fetching CBP analytics:', error);
-        // Set empty analytics on error
-        setAnalytics({
-          total_value: 0,
-          total_records: 0,
-          unique_carriers: 0,
-          unique_ports: 0,
-          average_value: 0
-        });
-      }
-    };
-
-    if (data.length > 0) {
-      fetchAnalytics();
-    }
-  }, [data]);
-
   // Filter data
   const filteredData = cbpData.filter(item => {
     const matchesSearch = !searchTerm || 
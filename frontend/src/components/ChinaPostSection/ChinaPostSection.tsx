@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import {
   Download,
   Eye,
@@ -8,21 +8,21 @@ import {
   Plane,
   TrendingUp,
 } from 'lucide-react';
-import { apiService } from '../../services/api';
 import Tooltip from '../Tooltip';
 
 interface ChinaPostSectionProps {
   data: any[];
   onDownload: () => void;
   isAvailable: boolean;
+  // Backend China Post analytics for the most recent upload, fetched once by the parent page
+  analytics: any;
 }
 
-const ChinaPostSection: React.FC<ChinaPostSectionProps> = ({ data, onDownload, isAvailable }) => {
+const ChinaPostSection: React.FC<ChinaPostSectionProps> = ({ data, onDownload, isAvailable, analytics }) => {
   const [searchTerm, setSearchTerm] = useState('');
   const [selectedAirline, setSelectedAirline] = useState('');
   const [selectedDestination, setSelectedDestination] = useState('');
   const [currentPage, setCurrentPage] = useState(1);
-  const [analytics, setAnalytics] = useState<any>(null);
   const itemsPerPage = 10;
 
   // Use backend-provided data - NO FRONTEND PROCESSING
@@ -70,36 +70,6 @@ const ChinaPostSection: React.FC<ChinaPostSectionProps> = ({ data, onDownload, i
     return matchesSearch && matchesAirline && matchesDestination;
   });
 
-  // Fetch analytics from backend for most recent upload only - NO FRONTEND CALCULATIONS
-  useEffect(() => {
-    const fetchAnalytics = async () => {
-      try {
-        // Get analytics for the most recent upload only (no date filtering)
-        const analyticsData = await apiService.getChinaPostAnalytics();
-        setAnalytics(analyticsData);
-      } catch (error) {
-        console.error('Error fetching China Post analytics:', error);
-        // Set empty analytics on error
-        setAnalytics({
-          total_weight: 0,
-          total_declared_value: 0,
-          total_records: 0,
-          total_tariff: 0,
-          unique_carriers: 0,
-          unique_destinations: 0,
-          unique_flights: 0,
-          average_weight: 0,
-          average_value: 0,
-          currency_breakdown: {}
-        });
-      }
-    };
-
-    if (data.length > 0) {
-      fetchAnalytics();
-    }
-  }, [data]);
-
   // Pagination
   const totalPages = Math.ceil(filteredData.length / itemsPerPage);
   const startIndex = (currentPage - 1) * itemsPerPage;
@@ -16,7 +16,7 @@ import {
 } from 'lucide-react';
 import { formatDateTime } from '../utils/displayHelpers';
 import { DataFile } from '../types';
-import { apiService, downloadBlob, ProcessDataResponse } from '../services/api';
+import { apiService, downloadBlob, ProcessDataResponse, EMPTY_ANALYTICS_SUMMARY } from '../services/api';
 import Dashboard from '../components/Dashboard/Dashboard';
 import CBPSection from '../components/CBPSection/CBPSection';
 import ChinaPostSection from '../components/ChinaPostSection/ChinaPostSection';
@@ -34,6 +34,24 @@ const DataIngestion: React.FC = () => {
     message: string;
     type: 'success' | 'error' | 'warning' | 'info';
   } | null>(null);
+  const [sectionAnalytics, setSectionAnalytics] = useState<any>(null);
+
+  // CBP and China Post analytics for the most recent upload, fetched once for both panels - NO FRONTEND CALCULATIONS
+  useEffect(() => {
+    const fetchSectionAnalytics = async () => {
+      try {
+        setSectionAnalytics(await apiService.getAnalyticsSummary());
+      } catch (error) {
+        console.error('Error fetching CBP / China Post analytics:', error);
+        // Set empty analytics on error
+        setSectionAnalytics(EMPTY_ANALYTICS_SUMMARY);
+      }
+    };
+
+    if (processedData.length > 0) {
+      fetchSectionAnalytics();
+    }
+  }, [processedData]);
 
   useEffect(() => {
     const checkBackendConnection = async () => {
@@ -816,6 +834,7 @@ const DataIngestion: React.FC = () => {
       {activeTab === 'cbp' && (
         <CBPSection 
           data={processedData} 
+          analytics={sectionAnalytics?.cbp ?? null}
           onDownload={handleGenerateCBP}
           isAvailable={processResult?.results?.cbp?.available || processResult?.results?.internal_use?.available || false}
         />
@@ -825,6 +844,7 @@ const DataIngestion: React.FC = () => {
       {activeTab === 'china-post' && (
         <ChinaPostSection 
           data={processedData} 
+          analytics={sectionAnalytics?.chinapost ?? null}
           onDownload={handleGenerateChinaPost}
           isAvailable={processResult?.results?.china_post?.available || processResult?.results?.internal_use?.available || false}
         />
@@ -12,7 +12,7 @@ import {
   Trash2,
   X
 } from 'lucide-react';
-import { apiService } from '../services/api';
+import { apiService, EMPTY_ANALYTICS_SUMMARY } from '../services/api';
 import { downloadBlob } from '../services/api';
 import Tooltip from '../components/Tooltip';
 import Dashboard from '../components/Dashboard/Dashboard';
@@ -33,6 +33,7 @@ const HistoricalData: React.FC = () => {
   const [rawBackendData, setRawBackendData] = useState<any[]>([]); // Store raw backend data for CBP/China Post
   const [processResult, setProcessResult] = useState<any>(null);
   const [analyticsData, setAnalyticsData] = useState<any>(null);
+  const [sectionAnalytics, setSectionAnalytics] = useState<any>(null);
   const [currentPage, setCurrentPage] = useState(1);
   const [recordsPerPage] = useState(10);
   const [isEditMode, setIsEditMode] = useState(false);
@@ -55,6 +56,23 @@ const HistoricalData: React.FC = () => {
     setSelectedRecords(new Set()); // Clear selections when data changes
   }, [historicalData, rawBackendData]);
 
+  // CBP and China Post analytics for the most recent upload, fetched once for both panels - NO FRONTEND CALCULATIONS
+  useEffect(() => {
+    const fetchSectionAnalytics = async () => {
+      try {
+        setSectionAnalytics(await apiService.getAnalyticsSummary());
+      } catch (error) {
+        console.error('Error fetching CBP / China Post analytics:', error);
+        // Set empty analytics on error
+        setSectionAnalytics(EMPTY_ANALYTICS_SUMMARY);
+      }
+    };
+
+    if (rawBackendData.length > 0) {
+      fetchSectionAnalytics();
+    }
+  }, [rawBackendData]);
+
   // Clear selections and exit edit mode when switching tabs
   useEffect(() => {
     setSelectedRecords(new Set());
@@ -753,6 +771,7 @@ const HistoricalData: React.FC = () => {
           {activeTab === 'cbp' && (
             <CBPSection
               data={rawBackendData}
+              analytics={sectionAnalytics?.cbp ?? null}
               isAvailable={true}
               onDownload={handleGenerateCBP}
             />
@@ -760,6 +779,7 @@ const HistoricalData: React.FC = () => {
           {activeTab === 'china-post' && (
             <ChinaPostSection
               data={rawBackendData}
+              analytics={sectionAnalytics?.chinapost ?? null}
               isAvailable={true}
               onDownload={handleGenerateChinaPost}
             />
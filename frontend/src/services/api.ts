@@ -457,6 +457,17 @@ class ApiService {
     return response.json();
   }
 
+  async getAnalyticsSummary() {
+    // CBP and China Post analytics from a single backend aggregation
+    const response = await fetch(`${API_BASE_URL}/analytics/summary`);
+    
+    if (!response.ok) {
+      throw new Error('Failed to get analytics summary');
+    }
+    
+    return response.json();
+  }
+
   async batchRecalculateTariffs(filters?: {
     start_date?: string;
     end_date?: string;
@@ -575,6 +586,29 @@ class ApiService {
 
 export const apiService = new ApiService();
 
+// Zeroed CBP / China Post analytics shown when the summary request fails
+export const EMPTY_ANALYTICS_SUMMARY = {
+  cbp: {
+    total_value: 0,
+    total_records: 0,
+    unique_carriers: 0,
+    unique_ports: 0,
+    average_value: 0
+  },
+  chinapost: {
+    total_weight: 0,
+    total_declared_value: 0,
+    total_records: 0,
+    total_tariff: 0,
+    unique_carriers: 0,
+    unique_destinations: 0,
+    unique_flights: 0,
+    average_weight: 0,
+    average_value: 0,
+    currency_breakdown: {}
+  }
+};
+
 export const downloadBlob = (blob: Blob, filename: string) => {
   const url = window.URL.createObjectURL(blob);
   const a = document.createElement('a');